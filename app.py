@@ -1,336 +1,3727 @@
 import os
 import json
+import base64
+import bisect
+import click
+import contextlib
+import csv
+import io
+import hashlib
+import functools
+import gzip
+import itertools
+import mimetypes
+import re
 import datetime
 import random
-from flask import Flask, request, jsonify, render_template, send_from_directory
-from flask_sqlalchemy import SQLAlchemy
+import socket
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+# Reference point for the cold-start measurement (see record_startup_time)
+MODULE_IMPORT_STARTED = time.perf_counter()
+
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from statistics import NormalDist
+from flask import Flask, Response, abort, g, has_request_context, request, jsonify, render_template, send_file, stream_with_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, orm
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.sql import func
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.exc import OperationalError
 from flask_cors import CORS
 from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import safe_join
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional, assets are then precompressed with gzip only
+    brotli = None
+
+# Initialize Flask app
+# /static is served by serve_static (hashed URLs, precompressed variants)
+app = Flask(__name__, static_folder=None)
+app.wsgi_app = ProxyFix(app.wsgi_app)
+CORS(app)
+app.logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# Configure SQLite database (will be created in current directory)
+basedir = os.path.abspath(os.path.dirname(__file__))
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'commercial_ai_experiments.db'))
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Connection pool. Pooled SQLite connections are shared between threads, and
+# the busy timeout makes writers wait for the write lock instead of failing.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+}
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    # Flask-SQLAlchemy would otherwise open a fresh connection per checkout
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']['poolclass'] = QueuePool
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args'] = {
+        'check_same_thread': False,
+        'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000,
+    }
+
+# SQLite pragmas applied to every new connection. WAL lets readers proceed
+# while a writer commits; NORMAL sync is durable across application crashes
+# in WAL mode and avoids an fsync per commit.
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)),
+    'foreign_keys': 'ON',
+}
+# Serve GET/HEAD requests from a separate pool of query_only connections
+app.config['SQLITE_READ_ONLY_GETS'] = os.environ.get('SQLITE_READ_ONLY_GETS', '1') not in ('0', 'false', 'no')
+
+# Experiment listing response cache: 'memory' (per process), 'sqlite' (shared
+# by all gunicorn workers through a cache file) or 'none'
+app.config['EXPERIMENTS_CACHE_BACKEND'] = os.environ.get('EXPERIMENTS_CACHE_BACKEND', 'memory')
+app.config['EXPERIMENTS_CACHE_SIZE'] = int(os.environ.get('EXPERIMENTS_CACHE_SIZE', 256))
+app.config['EXPERIMENTS_CACHE_TTL'] = float(os.environ.get('EXPERIMENTS_CACHE_TTL', 60))
+# Seconds an identical concurrent listing waits on the in-flight one (0 disables coalescing)
+app.config['LISTING_COALESCE_TIMEOUT'] = float(os.environ.get('LISTING_COALESCE_TIMEOUT', 10))
+# Change feed: log entries kept, and SSE poll interval / maximum stream length /
+# open streams per worker process (each holds a worker thread)
+app.config['CHANGE_LOG_RETENTION'] = int(os.environ.get('CHANGE_LOG_RETENTION', 100000))
+app.config['CHANGE_STREAM_POLL_SECONDS'] = float(os.environ.get('CHANGE_STREAM_POLL_SECONDS', 1))
+app.config['CHANGE_STREAM_MAX_SECONDS'] = float(os.environ.get('CHANGE_STREAM_MAX_SECONDS', 300))
+app.config['CHANGE_STREAM_MAX_CLIENTS'] = int(os.environ.get('CHANGE_STREAM_MAX_CLIENTS', 2))
+# Group-sequential analysis: two-sided alpha, boundary family
+# ('obrien-fleming' or 'pocock') and number of equally spaced planned looks
+app.config['ANALYSIS_ALPHA'] = float(os.environ.get('ANALYSIS_ALPHA', '0.05'))
+app.config['ANALYSIS_BOUNDARY'] = os.environ.get('ANALYSIS_BOUNDARY', 'obrien-fleming')
+app.config['ANALYSIS_LOOKS'] = int(os.environ.get('ANALYSIS_LOOKS', '5'))
+# Archival: experiments in these states move to the cold store once unchanged
+# for ARCHIVE_AFTER_DAYS (0 also archives them as soon as a PUT sets the state)
+app.config['ARCHIVE_STATES'] = tuple(
+    state.strip() for state in os.environ.get('ARCHIVE_STATES', 'Completed,Archived').split(',') if state.strip())
+app.config['ARCHIVE_AFTER_DAYS'] = float(os.environ.get('ARCHIVE_AFTER_DAYS', '30'))
+app.config['ARCHIVE_BATCH_SIZE'] = int(os.environ.get('ARCHIVE_BATCH_SIZE', '1000'))
+# Background jobs: worker threads per process, queued + running jobs allowed
+# across all processes, days finished jobs are kept, upload spool directory
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', '2'))
+app.config['JOB_MAX_PENDING'] = int(os.environ.get('JOB_MAX_PENDING', '100'))
+app.config['JOB_RETENTION_DAYS'] = int(os.environ.get('JOB_RETENTION_DAYS', '7'))
+app.config['JOB_SPOOL_DIR'] = os.environ.get('JOB_SPOOL_DIR', tempfile.gettempdir())
+# Request metrics: slow-request log threshold, Server-Timing header, and a
+# directory where each process publishes its metrics so /metrics can report
+# all gunicorn workers (per-process metrics only when unset)
+app.config['SLOW_REQUEST_MS'] = float(os.environ.get('SLOW_REQUEST_MS', '500'))
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', 'true').lower() == 'true'
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR') or None
+# Compress API and page responses of at least this many bytes with gzip
+app.config['COMPRESS_MIN_BYTES'] = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', '6'))
+# Rows per transaction when importing NDJSON
+app.config['IMPORT_CHUNK_SIZE'] = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+app.config['EXPERIMENTS_CACHE_PATH'] = os.environ.get(
+    'EXPERIMENTS_CACHE_PATH', os.path.join(basedir, 'commercial_ai_cache.db'))
+
+# Database engine layer
+@event.listens_for(Engine, 'connect')
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLITE_PRAGMAS to each new SQLite connection."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS'].items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+
+class RoutingSession(SignallingSession):
+    """Session that sends reads in GET/HEAD requests to the read-only engine."""
+
+    def get_bind(self, mapper=None, clause=None):
+        if (has_request_context() and request.method in ('GET', 'HEAD')
+                and not self._flushing and self.app.config['SQLITE_READ_ONLY_GETS']):
+            engine = read_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+_read_engine = None
+
+
+def read_engine():
+    """Engine whose connections are PRAGMA query_only, or None if not SQLite.
+
+    In WAL mode these readers never wait on the write lock, and a GET
+    handler cannot write by accident.
+    """
+    global _read_engine
+    if _read_engine is None:
+        engine = db.engine
+        if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+            return None
+        _read_engine = create_engine(engine.url, **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+
+        @event.listens_for(_read_engine, 'connect')
+        def set_query_only(dbapi_connection, connection_record):
+            dbapi_connection.execute('PRAGMA query_only = ON')
+    return _read_engine
+
+
+# Initialize database
+db = RoutingSQLAlchemy(app)
+
+# Store timestamps in SQLite's CURRENT_TIMESTAMP format so values written by
+# func.now() and bound Python datetimes compare consistently (keyset cursors)
+Timestamp = db.DateTime().with_variant(
+    sqlite.DATETIME(storage_format='%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d'),
+    'sqlite'
+)
+
+# Builders for the nested parts of an experiment's API representation. They
+# take anything with the experiments column attributes: model instances or
+# result rows from a column select (see the fast-path serializer).
+def isoformat(value):
+    return value.isoformat() if value else None
+
+
+def impact_dict(row):
+    return {
+        'value': row.impact_value,
+        'positiveBound': row.impact_positive_bound,
+        'negativeBound': row.impact_negative_bound,
+        'stdError': row.impact_std_error
+    }
+
+
+def participants_dict(row):
+    return {
+        'count': row.participants_count,
+        'target': row.participants_target,
+        'sampleSizeReached': row.sample_size_reached
+    }
+
+
+def duration_dict(row):
+    return {
+        'weeks': row.duration_weeks,
+        'days': row.duration_days
+    }
+
+
+def boundaries_list(row):
+    return row.boundaries_crossed.split(',') if row.boundaries_crossed else []
+
+
+# Define database models
+class Job(db.Model):
+    """A background job run by the in-process JobRunner."""
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed, cancelled
+    params = db.Column(db.Text, default='{}')  # JSON
+    progress = db.Column(db.Float, default=0)  # 0..1
+    message = db.Column(db.String(255))
+    result = db.Column(db.Text)  # JSON, set on success
+    error = db.Column(db.Text)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    worker = db.Column(db.String(100))  # host:pid of the process whose pool runs the job
+    created_at = db.Column(Timestamp, default=func.now())
+    started_at = db.Column(Timestamp)
+    finished_at = db.Column(Timestamp)
+
+    __table_args__ = (
+        db.Index('ix_jobs_status_created', 'status', 'created_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error,
+            'cancelRequested': bool(self.cancel_requested),
+            'createdAt': isoformat(self.created_at),
+            'startedAt': isoformat(self.started_at),
+            'finishedAt': isoformat(self.finished_at)
+        }
+
+class User(db.Model):
+    __tablename__ = 'users'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(100), unique=True, nullable=False)
+    department = db.Column(db.String(100), default='')
+    profile_picture = db.Column(db.String(255), default='')
+    created_at = db.Column(Timestamp, default=func.now())
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'email': self.email,
+            'department': self.department,
+            'profile_picture': self.profile_picture,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+# Association table for many-to-many relationship between experiments and users
+experiment_users = db.Table('experiment_users',
+    db.Column('experiment_id', db.Integer, db.ForeignKey('experiments.id'), primary_key=True),
+    db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
+    # The primary key leads on experiment_id; owner lookups need user_id first
+    db.Index('ix_experiment_users_user', 'user_id', 'experiment_id')
+)
+
+# One row per boundary an experiment has crossed, derived from the
+# boundaries_crossed column by SQLite triggers (see init_boundary_index) so the
+# boundary filter is an index lookup instead of a LIKE scan.
+experiment_boundaries = db.Table('experiment_boundaries',
+    db.Column('experiment_id', db.Integer, db.ForeignKey('experiments.id'), primary_key=True),
+    db.Column('boundary', db.String(50), primary_key=True),
+    db.Index('ix_experiment_boundaries_boundary', 'boundary', 'experiment_id')
+)
+
+# Write counters per logical dataset ('experiments', 'users'), bumped by
+# SQLite triggers on every row change. Used to derive ETags.
+table_versions = db.Table('table_versions',
+    db.Column('name', db.String(50), primary_key=True),
+    db.Column('version', db.Integer, nullable=False, default=0)
+)
+
+# Append-only log of experiment ids touched by writes, filled by SQLite
+# triggers. seq is AUTOINCREMENT so it never goes backwards after pruning.
+change_log = db.Table('experiment_change_log',
+    db.Column('seq', db.Integer, primary_key=True),
+    db.Column('experiment_id', db.Integer, nullable=False),
+    db.Column('changed_at', Timestamp, default=func.now()),
+    # Last change per experiment, for per-experiment ETags (experiment_version)
+    db.Index('ix_experiment_change_log_experiment', 'experiment_id', 'seq'),
+    sqlite_autoincrement=True
+)
+
+# Metric observations per experiment, appended by SQLite triggers whenever a
+# tracked metric changes. ts is unix seconds; WITHOUT ROWID stores rows in
+# (experiment_id, ts) order so a range scan reads contiguous pages.
+metric_history = db.Table('experiment_metric_history',
+    db.Column('experiment_id', db.Integer, primary_key=True),
+    db.Column('ts', db.Float, primary_key=True),
+    db.Column('confidence', db.Float),
+    db.Column('progress', db.Float),
+    db.Column('impact_value', db.Float),
+    db.Column('impact_positive_bound', db.Float),
+    db.Column('impact_negative_bound', db.Float),
+    db.Column('participants_count', db.Integer),
+    db.Column('participants_target', db.Integer),
+    sqlite_with_rowid=False
+)
+
+class Experiment(db.Model):
+    __tablename__ = 'experiments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    state = db.Column(db.String(20), default='Running')  # Running, Stopped, Completed, Archived
+    experiment_type = db.Column(db.String(50), nullable=False)  # Fixed Horizon, Group Sequential
+    stage = db.Column(db.String(50), default='Discovery')  # Discovery, Pre-launch, Phase 1, etc.
+    department = db.Column(db.String(50), default='')  # Marketing, Sales, Procurement, etc.
+    
+    # Impact data stored as JSON
+    impact_value = db.Column(db.Float, default=0)
+    impact_positive_bound = db.Column(db.Float, default=0)
+    impact_negative_bound = db.Column(db.Float, default=0)
+    impact_std_error = db.Column(db.Float)  # Derived from the bounds by the analysis engine when unset
+    
+    confidence = db.Column(db.Float, default=0)
+    progress = db.Column(db.Float, default=0)
+    
+    # Participants data
+    participants_count = db.Column(db.Integer, default=0)
+    participants_target = db.Column(db.Integer, default=30)
+    sample_size_reached = db.Column(db.Boolean, default=False)
+    
+    # Duration data
+    duration_weeks = db.Column(db.Integer, default=8)
+    duration_days = db.Column(db.Integer, default=0)
+    
+    significance = db.Column(db.String(20), default='Medium')  # Low, Medium, High
+    analysis_type = db.Column(db.String(50), default='A/B Test')  # A/B Test, Multivariate, Feature Flag, Custom
+    
+    boundaries_crossed = db.Column(db.String(255), default='')  # Comma-separated list of crossed boundaries
+    
+    created_at = db.Column(Timestamp, default=func.now())
+    updated_at = db.Column(Timestamp, default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    owners = db.relationship('User', secondary=experiment_users, backref=db.backref('experiments', lazy='dynamic'))
+
+    # Indexes for the dashboard filters, each ending in the listing sort key so
+    # a filtered page is read in order without a temp b-tree. Existing
+    # databases receive new indexes at startup via ensure_indexes().
+    __table_args__ = (
+        db.Index('ix_experiments_created', 'created_at', 'id'),
+        db.Index('ix_experiments_state_created', 'state', 'created_at', 'id'),
+        db.Index('ix_experiments_state_department_created', 'state', 'department', 'created_at', 'id'),
+        db.Index('ix_experiments_department_created', 'department', 'created_at', 'id'),
+        db.Index('ix_experiments_significance_created', 'significance', 'created_at', 'id'),
+        db.Index('ix_experiments_analysis_type_created', 'analysis_type', 'created_at', 'id'),
+        db.Index('ix_experiments_stage_created', 'stage', 'created_at', 'id'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'state': self.state,
+            'experimentType': self.experiment_type,
+            'stage': self.stage,
+            'department': self.department,
+            'impact': impact_dict(self),
+            'confidence': self.confidence,
+            'progress': self.progress,
+            'participants': participants_dict(self),
+            'duration': duration_dict(self),
+            'significance': self.significance,
+            'analysisType': self.analysis_type,
+            'boundariesCrossed': boundaries_list(self),
+            'owners': [owner.to_dict() for owner in self.owners],
+            'createdAt': isoformat(self.created_at),
+            'updatedAt': isoformat(self.updated_at)
+        }
+
+    @classmethod
+    def with_owners(cls):
+        """Query that loads owners for all matched rows in one batched SELECT."""
+        return cls.query.options(db.selectinload(cls.owners))
+
+
+# API field name -> model columns it is built from (used for sparse fieldsets)
+EXPERIMENT_FIELD_COLUMNS = {
+    'id': ['id'],
+    'name': ['name'],
+    'state': ['state'],
+    'experimentType': ['experiment_type'],
+    'stage': ['stage'],
+    'department': ['department'],
+    'impact': ['impact_value', 'impact_positive_bound', 'impact_negative_bound', 'impact_std_error'],
+    'confidence': ['confidence'],
+    'progress': ['progress'],
+    'participants': ['participants_count', 'participants_target', 'sample_size_reached'],
+    'duration': ['duration_weeks', 'duration_days'],
+    'significance': ['significance'],
+    'analysisType': ['analysis_type'],
+    'boundariesCrossed': ['boundaries_crossed'],
+    'owners': [],
+    'createdAt': ['created_at'],
+    'updatedAt': ['updated_at']
+}
+
+# API field name -> serializer of a column row, used by the fast-path serializer
+# (which handles owners itself)
+EXPERIMENT_FIELD_SERIALIZERS = {
+    'id': lambda e: e.id,
+    'name': lambda e: e.name,
+    'state': lambda e: e.state,
+    'experimentType': lambda e: e.experiment_type,
+    'stage': lambda e: e.stage,
+    'department': lambda e: e.department,
+    'impact': lambda e: impact_dict(e),
+    'confidence': lambda e: e.confidence,
+    'progress': lambda e: e.progress,
+    'participants': lambda e: participants_dict(e),
+    'duration': lambda e: duration_dict(e),
+    'significance': lambda e: e.significance,
+    'analysisType': lambda e: e.analysis_type,
+    'boundariesCrossed': lambda e: boundaries_list(e),
+    'createdAt': lambda e: isoformat(e.created_at),
+    'updatedAt': lambda e: isoformat(e.updated_at)
+}
+
+# Cold store
+#
+# Experiments in a terminal state move to experiments_archive (see Archival)
+# so the hot table and its indexes hold only the working set. Child tables
+# (owners, boundaries, search index, metric history) keep their rows keyed by
+# experiment id whichever store the experiment is in.
+experiments_archive = db.Table('experiments_archive',
+    *[db.Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+      for column in Experiment.__table__.columns],
+    db.Column('archived_at', Timestamp, default=func.now()),
+    db.Index('ix_experiments_archive_created', 'created_at', 'id'),
+    db.Index('ix_experiments_archive_state_created', 'state', 'created_at', 'id'),
+)
+
+# Experiment entity over both stores. SQLite pushes filters into each arm of
+# the UNION ALL and merges the two index-ordered scans for the listing sort.
+all_experiments = db.aliased(Experiment, db.union_all(
+    db.select(*Experiment.__table__.columns),
+    db.select(*[experiments_archive.c[column.name] for column in Experiment.__table__.columns]),
+).subquery('experiments_all'), name='experiments_all')
+
+# Trigger condition for hot-table triggers that must not fire while a row is
+# moved between the stores (the copy is written before the original is deleted)
+NOT_ARCHIVED = 'NOT EXISTS (SELECT 1 FROM experiments_archive WHERE id = {})'
+
+
+# Pagination defaults for experiment listings
+DEFAULT_PAGE_SIZE = int(os.environ.get('EXPERIMENTS_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.environ.get('EXPERIMENTS_MAX_PAGE_SIZE', 1000))
+
+
+def apply_experiment_filters(query, args, include_search=True, model=Experiment):
+    """Apply the dashboard filter query parameters to an experiment query.
+
+    Pass include_search=False when the caller joins the ranked search
+    subquery itself (see ranked_search). model is the entity the query
+    selects (see experiment_source).
+    """
+    state = args.get('state')
+    significance = args.get('significance')
+    owner_id = args.get('owner')
+    analysis_type = args.get('analysisType')
+    stage = args.get('stage')
+    department = args.get('department')
+    boundary = args.get('boundary')
+    search = args.get('search', '')
+
+    if state and state != 'Any':
+        query = query.filter(model.state == state)
+    if significance and significance != 'Any':
+        query = query.filter(model.significance == significance)
+    if analysis_type and analysis_type != 'Any':
+        query = query.filter(model.analysis_type == analysis_type)
+    if stage and stage != 'Any':
+        query = query.filter(model.stage == stage)
+    if department and department != 'Any':
+        query = query.filter(model.department == department)
+    if owner_id and owner_id != 'Any':
+        query = query.filter(owner_filter(owner_id, model))
+    if boundary and boundary != 'Any':
+        query = query.filter(boundary_filter(boundary, model))
+    if search and include_search:
+        query = query.filter(search_filter(search, model))
+    return query
+
+
+def experiment_source(args):
+    """Entity a filtered query reads: the hot table, plus the cold store only
+    when the state filter can match archived experiments."""
+    state = args.get('state')
+    if state and state != 'Any' and state not in app.config['ARCHIVE_STATES']:
+        return Experiment
+    return all_experiments
+
+
+def owner_filter(user_id, model=Experiment):
+    """Experiments owned by user_id, resolved through ix_experiment_users_user."""
+    return model.id.in_(
+        db.select(experiment_users.c.experiment_id).where(experiment_users.c.user_id == user_id)
+    )
+
+
+def query_with_owners(model=Experiment):
+    """Query for model that loads owners eagerly.
+
+    selectinload joins the owner query back to the experiments table, which
+    would miss archived rows, so the entity over both stores joins instead.
+    """
+    if model is Experiment:
+        return Experiment.with_owners()
+    return db.session.query(model).options(db.joinedload(model.owners))
+
+
+def load_experiment(experiment_id, model=Experiment):
+    """Load a single experiment together with its owners, or 404."""
+    return query_with_owners(model).filter(model.id == experiment_id).first_or_404()
+
+
+def parse_fields(value):
+    """Parse a ``fields=`` parameter into a list of API field names.
+
+    Returns None when no sparse fieldset was requested. Raises ValueError
+    for unknown field names.
+    """
+    if not value:
+        return None
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in EXPERIMENT_FIELD_COLUMNS]
+    if unknown:
+        raise ValueError('Unknown fields: ' + ', '.join(unknown))
+    return fields
+
+
+def encode_cursor(*values):
+    """Build an opaque keyset cursor from the sort key of the last row of a page."""
+    raw = json.dumps(list(values)).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor into its list of values."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def apply_cursor(query, cursor, model=Experiment):
+    """Restrict a (created_at DESC, id DESC) ordered query to rows after cursor."""
+    try:
+        created_at, experiment_id = decode_cursor(cursor)
+        if created_at is not None:
+            created_at = datetime.datetime.fromisoformat(created_at)
+        experiment_id = int(experiment_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if created_at is None:
+        return query.filter(model.created_at.is_(None), model.id < experiment_id)
+    return query.filter(db.or_(
+        model.created_at < created_at,
+        db.and_(model.created_at == created_at, model.id < experiment_id),
+        model.created_at.is_(None)
+    ))
+
+
+def apply_rank_cursor(query, rank, cursor, model=Experiment):
+    """Restrict a (rank ASC, id DESC) ordered search query to rows after cursor."""
+    try:
+        value, experiment_id = decode_cursor(cursor)
+        value = float(value)
+        experiment_id = int(experiment_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    return query.filter(db.or_(
+        rank > value,
+        db.and_(rank == value, model.id < experiment_id)
+    ))
+
+
+def parse_limit(value):
+    """Parse a ``limit=`` parameter, clamped to MAX_PAGE_SIZE."""
+    if value is None or value == '':
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+# Input mapping
+#
+# (path in the request JSON, column, expected type, default on create). Shared
+# by the single-item and bulk write endpoints and the NDJSON importer.
+EXPERIMENT_INPUT_FIELDS = [
+    (('name',), 'name', str, 'New Experiment'),
+    (('state',), 'state', str, 'Running'),
+    (('experimentType',), 'experiment_type', str, 'Fixed Horizon'),
+    (('stage',), 'stage', str, 'Discovery'),
+    (('department',), 'department', str, 'Marketing'),
+    (('impact', 'value'), 'impact_value', float, 0),
+    (('impact', 'positiveBound'), 'impact_positive_bound', float, 0),
+    (('impact', 'negativeBound'), 'impact_negative_bound', float, 0),
+    (('impact', 'stdError'), 'impact_std_error', float, None),
+    (('confidence',), 'confidence', float, 0),
+    (('progress',), 'progress', float, 0),
+    (('participants', 'count'), 'participants_count', int, 0),
+    (('participants', 'target'), 'participants_target', int, 30),
+    (('participants', 'sampleSizeReached'), 'sample_size_reached', bool, False),
+    (('duration', 'weeks'), 'duration_weeks', int, 8),
+    (('duration', 'days'), 'duration_days', int, 0),
+    (('significance',), 'significance', str, 'Medium'),
+    (('analysisType',), 'analysis_type', str, 'A/B Test'),
+]
+
+
+# Boundary names are stored comma-joined and indexed one row per name
+BOUNDARY_NAME = re.compile(r'[^,\x00-\x1f]{1,50}')
+
+
+def coerce_input(value, expected, label):
+    """Check a JSON input value against the expected column type."""
+    if expected is bool:
+        if isinstance(value, bool):
+            return value
+    elif expected is int:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+    elif expected is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    elif isinstance(value, expected):
+        return value
+    raise ValueError(f'{label} must be of type {expected.__name__}')
+
+
+def experiment_changes(data):
+    """Map a (partial) experiment payload to the column values it sets.
+
+    Only keys present in data are returned. Raises ValueError for malformed
+    input.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Experiment must be a JSON object')
+    values = {}
+    for path, column, expected, default in EXPERIMENT_INPUT_FIELDS:
+        container = data
+        for key in path[:-1]:
+            container = container.get(key)
+            if container is None:
+                break
+            if not isinstance(container, dict):
+                raise ValueError(f'{key} must be an object')
+        if container is not None and path[-1] in container:
+            values[column] = coerce_input(container[path[-1]], expected, '.'.join(path))
+    if 'boundariesCrossed' in data:
+        boundaries = data['boundariesCrossed']
+        if not isinstance(boundaries, list) or not all(
+                isinstance(b, str) and BOUNDARY_NAME.fullmatch(b) for b in boundaries):
+            raise ValueError('boundariesCrossed must be a list of names (up to 50 characters, no commas)')
+        values['boundaries_crossed'] = ','.join(dict.fromkeys(boundaries))
+    if ({'impact_positive_bound', 'impact_negative_bound'} & set(values)
+            and 'impact_std_error' not in values):
+        # New client bounds: let the analysis engine derive the error again
+        values['impact_std_error'] = None
+    return values
+
+
+def experiment_values(data):
+    """Map a create payload to a full set of column values, applying defaults.
+
+    Every payload yields the same keys, so bulk inserts can send the rows of
+    a chunk through one executemany.
+    """
+    values = {column: default for path, column, expected, default in EXPERIMENT_INPUT_FIELDS}
+    values['boundaries_crossed'] = ''
+    values.update(experiment_changes(data))
+    return values
+
+
+def owner_ids_input(data):
+    """Return the owner ids in a payload, or None if owners are not given."""
+    if 'owners' not in data:
+        return None
+    owner_ids = data['owners']
+    if not isinstance(owner_ids, list) or not all(
+            isinstance(i, int) and not isinstance(i, bool) for i in owner_ids):
+        raise ValueError('owners must be a list of user ids')
+    return owner_ids
+
+
+# Full-text search
+#
+# On SQLite the experiments_fts FTS5 table indexes experiment name,
+# department, analysis type and owner names (rowid = experiment id). It is
+# kept in sync by triggers, so Core bulk writes stay indexed as well. Other
+# databases (or SQLite builds without FTS5) fall back to ILIKE matching.
+FTS_TABLE = 'experiments_fts'
+
+FTS_REFRESH_SQL = '''
+    DELETE FROM experiments_fts WHERE rowid = {id};
+    INSERT INTO experiments_fts (rowid, name, department, analysis_type, owners)
+    SELECT e.id, e.name, e.department, e.analysis_type,
+           (SELECT group_concat(u.name, ' ') FROM experiment_users eu
+            JOIN users u ON u.id = eu.user_id WHERE eu.experiment_id = e.id)
+    FROM experiments e WHERE e.id = {id};
+'''
+
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS experiments_fts USING fts5(
+        name, department, analysis_type, owners,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS experiments_fts_ai AFTER INSERT ON experiments BEGIN"""
+    + FTS_REFRESH_SQL.format(id='NEW.id') + 'END',
+    """CREATE TRIGGER IF NOT EXISTS experiments_fts_au
+        AFTER UPDATE OF name, department, analysis_type ON experiments BEGIN"""
+    + FTS_REFRESH_SQL.format(id='NEW.id') + 'END',
+    """CREATE TRIGGER IF NOT EXISTS experiments_fts_ad AFTER DELETE ON experiments
+        WHEN """ + NOT_ARCHIVED.format('OLD.id') + """ BEGIN
+        DELETE FROM experiments_fts WHERE rowid = OLD.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS experiments_fts_owner_ai AFTER INSERT ON experiment_users BEGIN"""
+    + FTS_REFRESH_SQL.format(id='NEW.experiment_id') + 'END',
+    """CREATE TRIGGER IF NOT EXISTS experiments_fts_owner_ad AFTER DELETE ON experiment_users BEGIN"""
+    + FTS_REFRESH_SQL.format(id='OLD.experiment_id') + 'END',
+    """CREATE TRIGGER IF NOT EXISTS experiments_fts_user_au AFTER UPDATE OF name ON users BEGIN
+        UPDATE experiments_fts SET owners = (
+            SELECT group_concat(u.name, ' ') FROM experiment_users eu
+            JOIN users u ON u.id = eu.user_id WHERE eu.experiment_id = experiments_fts.rowid
+        ) WHERE rowid IN (SELECT experiment_id FROM experiment_users WHERE user_id = NEW.id);
+    END""",
+]
+
+_fts_enabled = None
+
+
+def init_search():
+    """Create the FTS5 index and its triggers, rebuilding it if it is empty."""
+    global _fts_enabled
+    if db.engine.dialect.name != 'sqlite':
+        _fts_enabled = False
+        return
+    try:
+        with db.engine.begin() as conn:
+            for statement in FTS_DDL:
+                conn.exec_driver_sql(statement)
+            indexed = conn.exec_driver_sql('SELECT count(*) FROM experiments_fts').scalar()
+            if indexed == 0:
+                conn.exec_driver_sql("""
+                    INSERT INTO experiments_fts (rowid, name, department, analysis_type, owners)
+                    SELECT e.id, e.name, e.department, e.analysis_type,
+                           (SELECT group_concat(u.name, ' ') FROM experiment_users eu
+                            JOIN users u ON u.id = eu.user_id WHERE eu.experiment_id = e.id)
+                    FROM experiments e
+                """)
+        _fts_enabled = True
+    except OperationalError:
+        # SQLite compiled without FTS5
+        app.logger.warning('FTS5 unavailable, experiment search falls back to LIKE')
+        _fts_enabled = False
+
+
+def fts_enabled():
+    """Whether the FTS5 index exists in the current database."""
+    global _fts_enabled
+    if _fts_enabled is None:
+        if db.engine.dialect.name != 'sqlite':
+            _fts_enabled = False
+        else:
+            found = db.session.execute(db.text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ), {'name': FTS_TABLE}).first()
+            _fts_enabled = found is not None
+    return _fts_enabled
+
+
+def search_terms(search):
+    """Split a free-text search into word tokens."""
+    return re.findall(r'\w+', search, re.UNICODE)
+
+
+def fts_match_expression(terms):
+    """Build an FTS5 MATCH expression requiring every term as a prefix."""
+    return ' '.join('"{}"*'.format(term) for term in terms)
+
+
+def fts_subquery(terms):
+    """Subquery of (id, rank) for experiments matching all terms, bm25-ranked."""
+    return db.select(
+        db.column('rowid').label('id'),
+        db.literal_column('bm25({})'.format(FTS_TABLE)).label('rank')
+    ).select_from(db.table(FTS_TABLE)).where(
+        db.literal_column(FTS_TABLE).op('MATCH')(fts_match_expression(terms))
+    ).subquery()
+
+
+def search_filter(search, model=Experiment):
+    """Filter clause matching experiments against a free-text search."""
+    terms = search_terms(search)
+    if not terms:
+        return db.true()
+    if fts_enabled():
+        return model.id.in_(db.select(fts_subquery(terms).c.id))
+    # Fallback: every term must appear in one of the indexed columns
+    clauses = []
+    for term in terms:
+        pattern = f'%{term}%'
+        clauses.append(db.or_(
+            model.name.ilike(pattern),
+            model.department.ilike(pattern),
+            model.analysis_type.ilike(pattern),
+            model.owners.any(User.name.ilike(pattern))
+        ))
+    return db.and_(*clauses)
+
+
+def ranked_search(query, search, model=Experiment):
+    """Join a query to the ranked FTS matches for search.
+
+    Returns (query, rank column), or (query, None) when ranking is not
+    available and the caller should filter with search_filter instead.
+    """
+    terms = search_terms(search)
+    if not terms or not fts_enabled():
+        return query, None
+    matches = fts_subquery(terms)
+    return query.join(matches, model.id == matches.c.id), matches.c.rank
+
+
+# Boundary index
+#
+# experiment_boundaries mirrors boundaries_crossed one row per name. The
+# comma-joined column stays the copy that serializers read (no extra query
+# per page); triggers split it with json_each on every write, so bulk
+# writes, imports and the analysis engine keep the index current.
+BOUNDARY_JSON = ("""'["' || replace(replace(replace({column}, '\\', '\\\\'), '"', '\\"'), """
+                 """',', '","') || '"]'""")
+BOUNDARY_INSERT_SQL = '''
+    INSERT OR IGNORE INTO experiment_boundaries (experiment_id, boundary)
+    SELECT {id}, value FROM json_each({array}) WHERE value <> '';
+'''
+
+BOUNDARY_TRIGGERS = {
+    'experiment_boundaries_ai': 'AFTER INSERT ON experiments BEGIN'
+        + BOUNDARY_INSERT_SQL.format(id='NEW.id', array=BOUNDARY_JSON.format(column='NEW.boundaries_crossed'))
+        + 'END',
+    'experiment_boundaries_au': """AFTER UPDATE OF boundaries_crossed ON experiments
+        WHEN OLD.boundaries_crossed IS NOT NEW.boundaries_crossed BEGIN
+        DELETE FROM experiment_boundaries WHERE experiment_id = OLD.id;"""
+        + BOUNDARY_INSERT_SQL.format(id='NEW.id', array=BOUNDARY_JSON.format(column='NEW.boundaries_crossed'))
+        + 'END',
+    'experiment_boundaries_ad': 'AFTER DELETE ON experiments WHEN ' + NOT_ARCHIVED.format('OLD.id') + """ BEGIN
+        DELETE FROM experiment_boundaries WHERE experiment_id = OLD.id;
+    END""",
+}
+
+_boundary_index_enabled = None
+
+
+def init_boundary_index():
+    """Create the boundary triggers, migrating existing comma strings once."""
+    global _boundary_index_enabled
+    if db.engine.dialect.name != 'sqlite':
+        _boundary_index_enabled = False
+        return
+    try:
+        with db.engine.begin() as conn:
+            existing = {row[0] for row in conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'experiment_boundaries_%'")}
+            for name, body in BOUNDARY_TRIGGERS.items():
+                conn.exec_driver_sql(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+            if not existing:
+                conn.exec_driver_sql('DELETE FROM experiment_boundaries')
+                conn.exec_driver_sql(
+                    'INSERT OR IGNORE INTO experiment_boundaries (experiment_id, boundary) '
+                    'SELECT e.id, j.value FROM experiments e, json_each('
+                    + BOUNDARY_JSON.format(column='e.boundaries_crossed')
+                    + ") j WHERE e.boundaries_crossed <> '' AND j.value <> ''"
+                )
+        _boundary_index_enabled = True
+    except OperationalError:
+        # SQLite compiled without JSON functions
+        app.logger.warning('json_each unavailable, the boundary filter falls back to LIKE')
+        _boundary_index_enabled = False
+
+
+def boundary_index_enabled():
+    """Whether the boundary triggers exist in the current database."""
+    global _boundary_index_enabled
+    if _boundary_index_enabled is None:
+        if db.engine.dialect.name != 'sqlite':
+            _boundary_index_enabled = False
+        else:
+            found = db.session.execute(db.text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'experiment_boundaries_ai'"
+            )).first()
+            _boundary_index_enabled = found is not None
+    return _boundary_index_enabled
+
+
+def boundary_filter(boundary, model=Experiment):
+    """SQL condition for experiments that crossed the named boundary."""
+    if boundary_index_enabled():
+        return model.id.in_(
+            db.select(experiment_boundaries.c.experiment_id)
+            .where(experiment_boundaries.c.boundary == boundary)
+        )
+    return (',' + model.boundaries_crossed + ',').like(f'%,{boundary},%')
+
+
+# Response cache
+#
+# Serialized listing responses are cached under the normalized request
+# parameters plus the database-wide experiments version (table_versions).
+# Any write, from any worker process or CLI command, bumps that version and
+# makes every earlier entry unreachable; stale entries then age out through
+# the LRU bound or their TTL. invalidate() only frees this process's entries
+# early.
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry TTL."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """LRU/TTL cache in a standalone SQLite file shared by all worker processes."""
+
+    def __init__(self, path, max_entries, ttl):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache_entries ('
+                         'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                         'expires REAL NOT NULL, last_used REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_entries_last_used ON cache_entries (last_used)')
+
+    def _connect(self):
+        # Connections are per thread and per process (never reuse one across fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute('SELECT value, expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+            return None
+        conn.execute('UPDATE cache_entries SET last_used = ? WHERE key = ?', (now, key))
+        return bytes(row[0])
+
+    def set(self, key, value):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('INSERT OR REPLACE INTO cache_entries (key, value, expires, last_used) VALUES (?, ?, ?, ?)',
+                     (key, value, now + self.ttl, now))
+        conn.execute('DELETE FROM cache_entries WHERE key IN (SELECT key FROM cache_entries '
+                     'ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache_entries')
+
+
+def normalized_args(args):
+    """Normalize request args: drop empty/'Any' filters and sort the rest."""
+    return sorted((k, v) for k, v in args.items(multi=True) if v not in ('', 'Any'))
+
+
+class ResponseCache:
+    """Cache of serialized listing responses, keyed by data version."""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    def key(self, args, version):
+        """Key for args at data version (the one the response's ETag is built from)."""
+        return '{}:{}'.format(version, json.dumps(normalized_args(args)))
+
+    def get(self, key):
+        return self.backend.get(key) if self.backend else None
+
+    def set(self, key, value):
+        if self.backend:
+            self.backend.set(key, value)
+
+    def invalidate(self):
+        if self.backend:
+            self.backend.clear()
+
+
+def create_cache_backend(config):
+    """Build the experiment listing cache backend selected in config."""
+    backend = config['EXPERIMENTS_CACHE_BACKEND']
+    if backend == 'memory':
+        return MemoryCacheBackend(config['EXPERIMENTS_CACHE_SIZE'], config['EXPERIMENTS_CACHE_TTL'])
+    if backend == 'sqlite':
+        return SQLiteCacheBackend(config['EXPERIMENTS_CACHE_PATH'], config['EXPERIMENTS_CACHE_SIZE'],
+                                  config['EXPERIMENTS_CACHE_TTL'])
+    if backend == 'none':
+        return None
+    raise ValueError('Unknown EXPERIMENTS_CACHE_BACKEND: ' + backend)
+
+
+experiment_cache = ResponseCache(create_cache_backend(app.config))
+
+
+class FlightTimeout(Exception):
+    """The in-flight computation a caller waited on did not finish in time."""
+
+
+class SingleFlight:
+    """Share one in-flight computation among concurrent callers of the same key.
+
+    The first caller of a key runs the function; callers arriving while it runs
+    wait for its result, or get its exception re-raised.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def run(self, key, fn, timeout):
+        """Return (result, shared); shared is True if another caller computed it."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+        if not leader:
+            if not call['done'].wait(timeout):
+                raise FlightTimeout(f'in-flight computation did not finish within {timeout:g}s')
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+        try:
+            call['result'] = fn()
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+        return call['result'], False
+
+
+listing_flights = SingleFlight()
+
+
+# Conditional requests
+#
+# ETags are derived from the write counters in table_versions, so a client
+# revalidating an unchanged listing gets a 304 without the row query or any
+# serialization. On SQLite the counters are maintained by triggers; other
+# databases fall back to a max(updated_at)/count fingerprint.
+VERSION_TRIGGERS = {
+    'experiments': ['experiments', 'experiments_archive', 'experiment_users', 'users'],
+    'users': ['users'],
+}
+
+
+def init_versioning():
+    """Create the table_versions rows and the triggers that bump them."""
+    with db.engine.begin() as conn:
+        for name in VERSION_TRIGGERS:
+            exists = conn.execute(db.select(table_versions.c.name).where(table_versions.c.name == name)).first()
+            if exists is None:
+                conn.execute(table_versions.insert().values(name=name, version=0))
+        if db.engine.dialect.name != 'sqlite':
+            return
+        for name, tables in VERSION_TRIGGERS.items():
+            for table in tables:
+                for operation in ('INSERT', 'UPDATE', 'DELETE'):
+                    conn.exec_driver_sql(
+                        f'CREATE TRIGGER IF NOT EXISTS version_{name}_{table}_{operation.lower()} '
+                        f'AFTER {operation} ON {table} BEGIN '
+                        f"UPDATE table_versions SET version = version + 1 WHERE name = '{name}'; END"
+                    )
+
+
+def data_version(name):
+    """Return a value that changes whenever the named dataset is written."""
+    if db.engine.dialect.name == 'sqlite':
+        return db.session.execute(
+            db.select(table_versions.c.version).where(table_versions.c.name == name)
+        ).scalar()
+    model = Experiment if name == 'experiments' else User
+    column = Experiment.updated_at if model is Experiment else User.created_at
+    latest, count = db.session.query(func.max(column), func.count(model.id)).one()
+    return f'{latest.isoformat() if latest else ""}-{count}'
+
+
+def make_etag(*parts):
+    """Strong ETag value from the given parts."""
+    return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+def not_modified(etag, last_modified=None):
+    """Return a 304 response if the request's validators match, else None."""
+    if request.if_none_match:
+        # Weak comparison: compressed responses carry the weak form of the ETag
+        matched = request.if_none_match.contains_weak(etag)
+    elif last_modified is not None and request.if_modified_since is not None:
+        matched = last_modified <= request.if_modified_since.replace(tzinfo=None)
+    else:
+        matched = False
+    if not matched:
+        return None
+    response = Response(status=304)
+    add_validators(response, etag, last_modified)
+    return response
+
+
+def add_validators(response, etag, last_modified=None):
+    """Attach ETag/Last-Modified and require revalidation before reuse."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+# Change feed
+#
+# Every write to experiments, their owners or owner names appends the
+# experiment id to experiment_change_log. Clients keep the last seq they saw
+# and ask for what changed since: the current state of each touched
+# experiment (upserts) and the ids that no longer exist (deletes).
+CHANGE_LOG_TRIGGERS = [
+    ('experiments', 'INSERT', 'NEW.id'),
+    ('experiments', 'UPDATE', 'NEW.id'),
+    ('experiments', 'DELETE', 'OLD.id'),
+    ('experiments_archive', 'DELETE', 'OLD.id'),
+    ('experiment_users', 'INSERT', 'NEW.experiment_id'),
+    ('experiment_users', 'DELETE', 'OLD.experiment_id'),
+]
+
+
+def init_change_log():
+    """Create the triggers that append to experiment_change_log."""
+    if db.engine.dialect.name != 'sqlite':
+        app.logger.warning('Change feed triggers are only created on SQLite')
+        return
+    with db.engine.begin() as conn:
+        for table, operation, experiment_id in CHANGE_LOG_TRIGGERS:
+            conn.exec_driver_sql(
+                f'CREATE TRIGGER IF NOT EXISTS change_log_{table}_{operation.lower()} '
+                f'AFTER {operation} ON {table} BEGIN '
+                f'INSERT INTO experiment_change_log (experiment_id) VALUES ({experiment_id}); END'
+            )
+        conn.exec_driver_sql(
+            'CREATE TRIGGER IF NOT EXISTS change_log_users_update AFTER UPDATE OF name ON users BEGIN '
+            'INSERT INTO experiment_change_log (experiment_id) '
+            'SELECT experiment_id FROM experiment_users WHERE user_id = NEW.id; END'
+        )
+        # Prune old entries every 1000 writes; clients that fall further behind get reset
+        conn.exec_driver_sql(
+            'CREATE TRIGGER IF NOT EXISTS change_log_prune AFTER INSERT ON experiment_change_log '
+            'WHEN NEW.seq % 1000 = 0 BEGIN '
+            'DELETE FROM experiment_change_log WHERE seq <= NEW.seq - {}; END'.format(
+                int(app.config['CHANGE_LOG_RETENTION']))
+        )
+
+
+def change_seq():
+    """The latest change log sequence number (0 if nothing was logged yet)."""
+    return db.session.execute(db.select(func.max(change_log.c.seq))).scalar() or 0
+
+
+def experiment_version(experiment_id):
+    """Version of one experiment's representation: the last seq that touched it.
+
+    The log records writes to the row, its owner links and its owners' names.
+    Without the SQLite triggers the dataset-wide version is used instead.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return data_version('experiments')
+    return db.session.execute(
+        db.select(func.max(change_log.c.seq)).where(change_log.c.experiment_id == experiment_id)
+    ).scalar() or 0
+
+
+def experiment_etag(experiment_id, updated_at, version):
+    """ETag of a single experiment at experiment_version() version.
+
+    Shared by GET and the PATCH precondition. The users version covers owner
+    fields the change log does not track.
+    """
+    return make_etag('experiment', experiment_id, updated_at, version, data_version('users'))
+
+
+def changes_since(since, limit):
+    """Collect the experiments changed after seq since.
+
+    Returns a dict with upserts (experiment dicts), deletes (ids), the seq to
+    resume from and hasMore. reset is set when since predates the retained
+    log, in which case the client must reload the full listing.
+    """
+    earliest = db.session.execute(db.select(func.min(change_log.c.seq))).scalar()
+    if earliest is not None and since < earliest - 1:
+        return {'reset': True, 'seq': change_seq(), 'upserts': [], 'deletes': [], 'hasMore': False}
+
+    last_seq = func.max(change_log.c.seq).label('last_seq')
+    rows = db.session.execute(
+        db.select(change_log.c.experiment_id, last_seq)
+        .where(change_log.c.seq > since)
+        .group_by(change_log.c.experiment_id)
+        .order_by(last_seq)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    ids = [row.experiment_id for row in rows]
+    experiments = query_with_owners(all_experiments).filter(all_experiments.id.in_(ids)).all() if ids else []
+    found = {experiment.id for experiment in experiments}
+    return {
+        'reset': False,
+        'seq': rows[-1].last_seq if rows else since,
+        'upserts': [experiment.to_dict() for experiment in experiments],
+        'deletes': [experiment_id for experiment_id in ids if experiment_id not in found],
+        'hasMore': has_more
+    }
+
+
+# Fast-path serialization
+#
+# Listings and exports select plain column rows (no ORM instances or identity
+# map), look owners up through one link query per page and reuse pre-encoded
+# owner JSON, and emit bytes directly (orjson when installed).
+def json_bytes(value):
+    """Encode value as compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':')).encode()
+
+
+class UserFragmentCache:
+    """Per-process cache of owner dicts and their encoded JSON.
+
+    Entries are keyed by user id and dropped whenever the users data version
+    changes, so owners are encoded once rather than once per experiment.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._fragments = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, user_ids):
+        """Return a dict user id -> (dict, JSON bytes) covering user_ids."""
+        version = data_version('users')
+        with self._lock:
+            if version != self._version:
+                self._fragments = {}
+                self._version = version
+            fragments = self._fragments
+        missing = [user_id for user_id in set(user_ids) if user_id not in fragments]
+        for chunk in chunked(missing, BULK_CHUNK_SIZE):
+            for user in User.query.filter(User.id.in_(chunk)):
+                data = user.to_dict()
+                fragments[user.id] = (data, json_bytes(data))
+        return fragments
+
+
+user_fragments = UserFragmentCache()
+
+EXPERIMENT_COLUMNS = list(Experiment.__table__.c)
+
+
+def owner_links(experiment_ids):
+    """Map experiment id -> owner user ids with one query per chunk of ids."""
+    owners = {}
+    for chunk in chunked(experiment_ids, BULK_CHUNK_SIZE):
+        rows = db.session.execute(
+            db.select(experiment_users.c.experiment_id, experiment_users.c.user_id)
+            .where(experiment_users.c.experiment_id.in_(chunk))
+        )
+        for experiment_id, user_id in rows:
+            owners.setdefault(experiment_id, []).append(user_id)
+    return owners
+
+
+class ExperimentRowSerializer:
+    """Serialize experiment column rows to JSON bytes, one object per row."""
+
+    def __init__(self, fields=None, owner_ids=False):
+        names = fields if fields is not None else list(EXPERIMENT_FIELD_COLUMNS)
+        self.serializers = [(name, EXPERIMENT_FIELD_SERIALIZERS[name]) for name in names if name != 'owners']
+        self.with_owners = 'owners' in names
+        self.owner_ids = owner_ids
+        self.users = {}
+        self.seen_users = set()
+
+    def serialize(self, rows):
+        owners = owner_links([row.id for row in rows]) if self.with_owners and rows else {}
+        if owners:
+            self.users = user_fragments.get_many([i for ids in owners.values() for i in ids])
+        encoded = []
+        for row in rows:
+            body = json_bytes({name: serialize(row) for name, serialize in self.serializers})
+            if self.with_owners:
+                owner_list = owners.get(row.id, [])
+                if self.owner_ids:
+                    self.seen_users.update(owner_list)
+                    fragment = json_bytes(owner_list)
+                else:
+                    fragment = b'[' + b','.join(self.users[i][1] for i in owner_list if i in self.users) + b']'
+                body = body[:-1] + (b',' if len(body) > 2 else b'') + b'"owners":' + fragment + b'}'
+            encoded.append(body)
+        return encoded
+
+    def users_map(self):
+        """JSON object of the owners referenced so far, keyed by id."""
+        return b'{' + b','.join(
+            b'"%d":%s' % (user_id, self.users[user_id][1])
+            for user_id in sorted(self.seen_users) if user_id in self.users
+        ) + b'}'
+
+
+@app.cli.command('bench-serialization')
+@click.option('--rows', default=5000, help='Experiments per run.')
+@click.option('--repeat', default=3, help='Runs per serializer; the best is reported.')
+def bench_serialization_command(rows, repeat):
+    """Compare rows/sec of Experiment.to_dict + json against the fast path."""
+    def orm_path():
+        experiments = Experiment.with_owners().order_by(
+            Experiment.created_at.desc(), Experiment.id.desc()).limit(rows).all()
+        return json.dumps({'experiments': [experiment.to_dict() for experiment in experiments]}).encode()
+
+    def fast_path():
+        result = db.session.query(*EXPERIMENT_COLUMNS).order_by(
+            Experiment.created_at.desc(), Experiment.id.desc()).limit(rows).all()
+        return b'{"experiments":[' + b','.join(ExperimentRowSerializer().serialize(result)) + b']}'
+
+    print(f"JSON backend: {'orjson' if orjson is not None else 'stdlib json'}")
+    for label, run in (('to_dict', orm_path), ('fast path', fast_path)):
+        best = None
+        for _ in range(repeat):
+            db.session.remove()
+            started = time.perf_counter()
+            body = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        count = len(json.loads(body)['experiments'])
+        print(f'{label:>10}: {count} rows in {best:.3f}s = {count / best:,.0f} rows/s, {len(body):,} bytes')
+
+
+# Metric history
+HISTORY_METRICS = ['confidence', 'progress', 'impact_value', 'impact_positive_bound',
+                   'impact_negative_bound', 'participants_count', 'participants_target']
+# API names for the history columns
+HISTORY_FIELDS = {
+    'confidence': 'confidence',
+    'progress': 'progress',
+    'impact_value': 'impactValue',
+    'impact_positive_bound': 'impactPositiveBound',
+    'impact_negative_bound': 'impactNegativeBound',
+    'participants_count': 'participantsCount',
+    'participants_target': 'participantsTarget',
+}
+MAX_HISTORY_POINTS = 10000
+BUCKET_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def init_metric_history():
+    """Create the triggers that record metric observations, backfilling once."""
+    if db.engine.dialect.name != 'sqlite':
+        app.logger.warning('Metric history triggers are only created on SQLite')
+        return
+    columns = ', '.join(HISTORY_METRICS)
+    values = ', '.join('NEW.' + column for column in HISTORY_METRICS)
+    record = (f'INSERT OR REPLACE INTO experiment_metric_history (experiment_id, ts, {columns}) '
+              f"VALUES (NEW.id, (julianday('now') - 2440587.5) * 86400.0, {values}); END")
+    changed = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in HISTORY_METRICS)
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TRIGGER IF NOT EXISTS metric_history_insert AFTER INSERT ON experiments '
+                             'WHEN ' + NOT_ARCHIVED.format('NEW.id') + ' BEGIN ' + record)
+        conn.exec_driver_sql('CREATE TRIGGER IF NOT EXISTS metric_history_update '
+                             f'AFTER UPDATE ON experiments WHEN {changed} BEGIN ' + record)
+        conn.exec_driver_sql('CREATE TRIGGER IF NOT EXISTS metric_history_delete AFTER DELETE ON experiments '
+                             'WHEN ' + NOT_ARCHIVED.format('OLD.id') + ' BEGIN '
+                             'DELETE FROM experiment_metric_history WHERE experiment_id = OLD.id; END')
+        if conn.exec_driver_sql('SELECT 1 FROM experiment_metric_history LIMIT 1').first() is None:
+            conn.exec_driver_sql(
+                f'INSERT INTO experiment_metric_history (experiment_id, ts, {columns}) '
+                f"SELECT id, CAST(strftime('%s', coalesce(updated_at, created_at, 'now')) AS REAL), {columns} "
+                'FROM experiments'
+            )
+
+
+def parse_time(value):
+    """Parse unix seconds or an ISO 8601 timestamp (UTC) into unix seconds."""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_bucket(value):
+    """Parse a bucket width such as '3600', '15m', '1h' or '1d' into seconds."""
+    if value is None or value == '':
+        return None
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhdw]?)', value.strip())
+    if not match or float(match.group(1)) <= 0:
+        raise ValueError('bucket must be a positive number of seconds or e.g. 15m, 1h, 1d')
+    return float(match.group(1)) * BUCKET_UNITS.get(match.group(2) or 's')
+
+
+def metric_history_points(experiment_id, start, end, bucket):
+    """Metric observations in [start, end), columnar, oldest first.
+
+    With a bucket width the last observation in each bucket is returned,
+    using SQLite's bare-column max() semantics, plus the bucket's count.
+    """
+    table = metric_history
+    conditions = [table.c.experiment_id == experiment_id]
+    if start is not None:
+        conditions.append(table.c.ts >= start)
+    if end is not None:
+        conditions.append(table.c.ts < end)
+    metrics = [table.c[column] for column in HISTORY_METRICS]
+    if bucket:
+        bucket_key = func.floor(table.c.ts / bucket) if db.engine.dialect.name != 'sqlite' \
+            else db.cast(table.c.ts / bucket, db.Integer)
+        statement = db.select(func.max(table.c.ts), *metrics, func.count()) \
+            .where(*conditions).group_by(bucket_key).order_by(bucket_key)
+    else:
+        statement = db.select(table.c.ts, *metrics).where(*conditions).order_by(table.c.ts)
+    rows = db.session.execute(statement.limit(MAX_HISTORY_POINTS + 1)).all()
+
+    truncated = len(rows) > MAX_HISTORY_POINTS
+    rows = rows[:MAX_HISTORY_POINTS]
+    points = {'ts': [row[0] for row in rows]}
+    for index, column in enumerate(HISTORY_METRICS, start=1):
+        points[HISTORY_FIELDS[column]] = [row[index] for row in rows]
+    if bucket:
+        points['count'] = [row[-1] for row in rows]
+    return points, truncated
+
+
+# API Routes
+@app.route('/api/experiments', methods=['GET'])
+def get_experiments():
+    return experiment_listing_response(request.args)
+
+
+def experiment_listing_response(args):
+    """Listing for args with ETag revalidation and the response cache."""
+    # Unchanged listings are answered from the ETag alone
+    version = data_version('experiments')
+    etag = make_etag('experiments', version, sorted(args.items(multi=True)))
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    # Serve identical listings from the response cache until the next write.
+    # The key uses the version the ETag was built from, so a cached body is
+    # never served under the ETag of another version.
+    cache_key = experiment_cache.key(args, version)
+    body = experiment_cache.get(cache_key)
+    if body is not None:
+        response = Response(body, mimetype='application/json', headers={'X-Cache': 'HIT'})
+        return add_validators(response, etag)
+
+    def render():
+        response = app.make_response(list_experiments(args))
+        if response.status_code == 200:
+            experiment_cache.set(cache_key, response.get_data())
+        return response.status_code, response.get_data(), response.mimetype
+
+    status, body, mimetype, outcome = coalesced_listing((version, json.dumps(normalized_args(args))), render)
+    response = Response(body, status=status, mimetype=mimetype)
+    if status == 200:
+        response.headers['X-Cache'] = 'COALESCED' if outcome == 'coalesced' else 'MISS'
+        add_validators(response, etag)
+    return response
+
+
+def coalesced_listing(key, render):
+    """Run render once for concurrent identical listings at the same data version.
+
+    Returns (status, body, mimetype, outcome). A caller whose wait times out
+    renders on its own; an error of the shared render fails every waiter.
+    """
+    timeout = app.config['LISTING_COALESCE_TIMEOUT']
+    if timeout <= 0:
+        return render() + ('uncoalesced',)
+    try:
+        (status, body, mimetype), shared = listing_flights.run(key, render, timeout)
+    except FlightTimeout:
+        request_metrics.inc('listing_coalesce_total', ('timeout',))
+        return render() + ('timeout',)
+    except Exception:
+        request_metrics.inc('listing_coalesce_total', ('error',))
+        raise
+    outcome = 'coalesced' if shared else 'leader'
+    request_metrics.inc('listing_coalesce_total', (outcome,))
+    return status, body, mimetype, outcome
+
+
+def list_experiments(args):
+    """Build the experiment listing response for the given query args."""
+    try:
+        fields = parse_fields(args.get('fields'))
+        limit = parse_limit(args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    cursor = args.get('cursor')
+    include_total = args.get('count', 'true').lower() not in ('0', 'false', 'no')
+    # ownerFormat=ids returns owner ids per experiment plus a de-duplicated users map
+    owner_ids = args.get('ownerFormat') == 'ids'
+
+    # Read before the rows so a client resuming the change feed from here
+    # can only see a change twice, never miss one
+    change_seq_before = change_seq()
+
+    # Start with base query and apply filters. Searches are ranked by
+    # relevance unless sort=recent asks for the default newest-first order.
+    search = args.get('search', '')
+    model = experiment_source(args)
+    query = apply_experiment_filters(db.session.query(model), args, include_search=False, model=model)
+    rank = None
+    if search and args.get('sort') != 'recent':
+        query, rank = ranked_search(query, search, model)
+    if search and rank is None:
+        query = query.filter(search_filter(search, model))
+
+    # Total is a separate COUNT query so it can be skipped by clients paging forward
+    total = None
+    if include_total:
+        total = query.with_entities(func.count(model.id)).order_by(None).scalar()
+    # Ids above lastId were created after the total was counted, which lets a
+    # change feed client tell new experiments from ones it hasn't paged to
+    last_id = last_experiment_id()
+
+    # Only select the columns needed for the requested fields (plus the cursor keys)
+    if fields is None:
+        columns = EXPERIMENT_COLUMNS
+    else:
+        names = {'id', 'created_at'}
+        for name in fields:
+            names.update(EXPERIMENT_FIELD_COLUMNS[name])
+        columns = [column for column in EXPERIMENT_COLUMNS if column.name in names]
+    query = query.with_entities(*[getattr(model, column.key) for column in columns])
+    serializer = ExperimentRowSerializer(fields, owner_ids=owner_ids)
+
+    try:
+        if rank is not None:
+            if cursor:
+                query = apply_rank_cursor(query, rank, cursor, model)
+            # Best match first (bm25 is lower for better matches), id breaks ties
+            query = query.add_columns(rank).order_by(rank, model.id.desc())
+        else:
+            if cursor:
+                query = apply_cursor(query, cursor, model)
+            # Sort by created_at in descending order (newest first), id breaks ties
+            query = query.order_by(model.created_at.desc(), model.id.desc())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        if rank is not None:
+            next_cursor = encode_cursor(last.rank, last.id)
+        else:
+            next_cursor = encode_cursor(isoformat(last.created_at), last.id)
+
+    # Assemble the JSON body from the per-row fragments
+    with timed_serialization():
+        body = b'{"experiments":[' + b','.join(serializer.serialize(rows)) + b']'
+        if owner_ids and serializer.with_owners:
+            body += b',"users":' + serializer.users_map()
+        tail = json_bytes({'total': total, 'nextCursor': next_cursor, 'changeSeq': change_seq_before,
+                           'lastId': last_id})
+    return Response(body + b',' + tail[1:], mimetype='application/json')
+
+@app.route('/api/experiments/<int:experiment_id>', methods=['GET'])
+def get_experiment(experiment_id):
+    # Check validators against the row's updated_at before loading owners
+    updated_at = db.session.query(all_experiments.updated_at) \
+        .filter(all_experiments.id == experiment_id).first_or_404()[0]
+    version = experiment_version(experiment_id)
+    etag = experiment_etag(experiment_id, updated_at, version)
+    response = not_modified(etag, updated_at)
+    if response is not None:
+        return response
+
+    experiment = load_experiment(experiment_id, all_experiments)
+    with timed_serialization():
+        # version is the precondition PATCH accepts in the body
+        response = jsonify(dict(experiment.to_dict(), version=version))
+    return add_validators(response, etag, updated_at)
+
+@app.route('/api/experiments/<int:experiment_id>/history', methods=['GET'])
+def get_experiment_history(experiment_id):
+    """Metric trajectory of one experiment; see metric_history_points."""
+    try:
+        start = parse_time(request.args.get('from'))
+        end = parse_time(request.args.get('to'))
+        bucket = parse_bucket(request.args.get('bucket'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    etag = make_etag('history', experiment_id, data_version('experiments'), sorted(request.args.items()))
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    db.session.query(all_experiments.id).filter(all_experiments.id == experiment_id).first_or_404()
+    points, truncated = metric_history_points(experiment_id, start, end, bucket)
+    body = json_bytes({'experimentId': experiment_id, 'bucket': bucket, 'truncated': truncated, 'points': points})
+    return add_validators(Response(body, mimetype='application/json'), etag)
+
+@app.route('/api/experiments', methods=['POST'])
+def create_experiment():
+    data = request.json
+    
+    try:
+        values = experiment_values(data)
+        owner_ids = owner_ids_input(data) or []
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Create experiment. Ids are allocated above both stores so an archived
+    # experiment's id is never handed out again.
+    lock_experiments_for_write()
+    experiment = Experiment(id=next_experiment_id(), **values)
+    
+    # Add owners
+    if owner_ids:
+        owners = User.query.filter(User.id.in_(owner_ids)).all()
+        for owner in owners:
+            experiment.owners.append(owner)
+    
+    db.session.add(experiment)
+    db.session.commit()
+    experiment_cache.invalidate()
+    
+    # Reload after commit so the row and its owners refresh in two queries
+    experiment = load_experiment(experiment.id)
+    return jsonify(experiment.to_dict()), 201
+
+@app.route('/api/experiments/<int:experiment_id>', methods=['PUT'])
+def update_experiment(experiment_id):
+    if is_archived(experiment_id):
+        return jsonify({'error': 'Experiment is archived; restore it before editing'}), 409
+    experiment = load_experiment(experiment_id)
+    data = request.json
+    
+    try:
+        changes = experiment_changes(data)
+        owner_ids = owner_ids_input(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Update simple and nested fields
+    for column, value in changes.items():
+        setattr(experiment, column, value)
+    
+    # Update owners if provided
+    if owner_ids is not None:
+        experiment.owners = []  # Clear existing owners
+        
+        if owner_ids:
+            owners = User.query.filter(User.id.in_(owner_ids)).all()
+            for owner in owners:
+                experiment.owners.append(owner)
+    
+    # Update timestamp
+    experiment.updated_at = func.now()
+    
+    db.session.commit()
+    experiment_cache.invalidate()
+    if app.config['ARCHIVE_AFTER_DAYS'] == 0 and experiment.state in app.config['ARCHIVE_STATES']:
+        archive_experiments(ids=[experiment_id])
+    experiment = load_experiment(experiment_id, all_experiments)
+    return jsonify(experiment.to_dict())
+
+# API path of each writable column, for reporting what a PATCH changed
+EXPERIMENT_INPUT_PATHS = dict(
+    {column: '.'.join(path) for path, column, expected, default in EXPERIMENT_INPUT_FIELDS},
+    boundaries_crossed='boundariesCrossed')
+
+
+@app.route('/api/experiments/<int:experiment_id>', methods=['PATCH'])
+def patch_experiment(experiment_id):
+    """Apply a partial update: only changed columns, only owner links that differ.
+
+    If-Match (an ETag from GET) or a version field in the body (the change
+    log seq GET returned, which unlike updatedAt never repeats) guard against
+    lost updates with 412. The response carries the new ETag and version and
+    lists what changed; Prefer: return=minimal answers 204 instead.
+    """
+    data = request.get_json(silent=True)
+    try:
+        changes = experiment_changes(data)
+        owner_ids = owner_ids_input(data)
+        expected_version = data.get('version')
+        if expected_version is not None and (type(expected_version) is not int or expected_version < 0):
+            raise ValueError('version must be a non-negative integer')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Hold the write lock from the version check to the commit
+    lock_experiments_for_write()
+    table = Experiment.__table__
+    row = db.session.execute(
+        db.select(table.c.updated_at, *[table.c[column] for column in changes]).where(table.c.id == experiment_id)
+    ).first()
+    if row is None:
+        db.session.rollback()
+        if is_archived(experiment_id):
+            return jsonify({'error': 'Experiment is archived; restore it before editing'}), 409
+        abort(404)
+    version = experiment_version(experiment_id)
+    # Weak comparison: compressed GET responses carry the weak form of the ETag
+    etag = experiment_etag(experiment_id, row.updated_at, version)
+    if request.if_match and not request.if_match.contains_weak(etag):
+        db.session.rollback()
+        return jsonify({'error': 'Experiment was modified (If-Match)'}), 412
+    if expected_version is not None and expected_version != version:
+        db.session.rollback()
+        return jsonify({'error': 'Experiment was modified (version)'}), 412
+
+    changed = {column: value for column, value in changes.items() if row._mapping[column] != value}
+    if ('impact_std_error' in changed and 'stdError' not in (data.get('impact') or {})
+            and not {'impact_positive_bound', 'impact_negative_bound'} & set(changed)):
+        # The error is only reset when the bounds actually change
+        del changed['impact_std_error']
+
+    added = removed = []
+    if owner_ids is not None:
+        current = {user_id for (user_id,) in db.session.execute(
+            db.select(experiment_users.c.user_id).where(experiment_users.c.experiment_id == experiment_id))}
+        wanted = list(dict.fromkeys(owner_ids))
+        missing = sorted(set(wanted) - existing_ids(User.id, wanted))
+        if missing:
+            db.session.rollback()
+            return jsonify({'error': f'Unknown owner ids: {missing}'}), 400
+        added = [user_id for user_id in wanted if user_id not in current]
+        removed = sorted(current - set(wanted))
+
+    if changed or added or removed:
+        db.session.execute(table.update().where(table.c.id == experiment_id)
+                           .values(updated_at=func.now(), **changed))
+        if removed:
+            db.session.execute(experiment_users.delete().where(
+                experiment_users.c.experiment_id == experiment_id, experiment_users.c.user_id.in_(removed)))
+        if added:
+            db.session.execute(experiment_users.insert(),
+                               [{'experiment_id': experiment_id, 'user_id': user_id} for user_id in added])
+        db.session.commit()
+        experiment_cache.invalidate()
+        if (app.config['ARCHIVE_AFTER_DAYS'] == 0
+                and changed.get('state') in app.config['ARCHIVE_STATES']):
+            archive_experiments(ids=[experiment_id])
+    else:
+        db.session.rollback()
+
+    updated_at = db.session.query(all_experiments.updated_at).filter(all_experiments.id == experiment_id).scalar()
+    version = experiment_version(experiment_id)
+    etag = experiment_etag(experiment_id, updated_at, version)
+    if 'return=minimal' in request.headers.get('Prefer', ''):
+        response = Response(status=204)
+    else:
+        response = jsonify({
+            'id': experiment_id,
+            'updatedAt': isoformat(updated_at),
+            'version': version,
+            'changed': [EXPERIMENT_INPUT_PATHS[column] for column in changed],
+            'owners': {'added': added, 'removed': removed},
+        })
+    response.set_etag(etag)
+    return response
+
+
+@app.route('/api/experiments/<int:experiment_id>', methods=['DELETE'])
+def delete_experiment(experiment_id):
+    if is_archived(experiment_id):
+        # The cold store's delete trigger removes owners, boundaries and history
+        db.session.execute(experiments_archive.delete().where(experiments_archive.c.id == experiment_id))
+    else:
+        experiment = Experiment.query.get_or_404(experiment_id)
+        db.session.delete(experiment)
+    db.session.commit()
+    experiment_cache.invalidate()
+    return jsonify({'message': 'Experiment deleted successfully'})
+
+# Portfolio statistics
+STATS_DIMENSIONS = [
+    ('byState', Experiment.state),
+    ('byDepartment', Experiment.department),
+    ('byStage', Experiment.stage),
+    ('bySignificance', Experiment.significance),
+]
+
+
+def experiment_stats(query, model=Experiment):
+    """Aggregate a filtered experiment query in a single GROUP BY.
+
+    Rows are grouped by every dimension at once; the number of groups is
+    bounded by the distinct dimension values, so the per-dimension counts
+    and overall totals are rolled up from those few rows in Python.
+    """
+    columns = [getattr(model, column.key) for name, column in STATS_DIMENSIONS]
+    rows = query.with_entities(
+        *columns,
+        func.count(model.id),
+        func.sum(model.impact_value),
+        func.sum(model.impact_value * model.participants_count),
+        func.sum(model.participants_count),
+        func.sum(model.participants_target),
+        func.sum(db.case((model.sample_size_reached == db.true(), 1), else_=0)),
+    ).order_by(None).group_by(*columns).all()
+
+    total = impact_sum = weighted_sum = participants = target = reached = 0
+    breakdowns = {name: {} for name, column in STATS_DIMENSIONS}
+    for row in rows:
+        keys, (count, row_impact, row_weighted, row_participants, row_target, row_reached) = \
+            row[:len(columns)], row[len(columns):]
+        for (name, column), key in zip(STATS_DIMENSIONS, keys):
+            key = key if key is not None else ''
+            breakdowns[name][key] = breakdowns[name].get(key, 0) + count
+        total += count
+        impact_sum += row_impact or 0
+        weighted_sum += row_weighted or 0
+        participants += row_participants or 0
+        target += row_target or 0
+        reached += row_reached or 0
+
+    return dict({
+        'total': total,
+        'impact': {
+            'mean': impact_sum / total if total else None,
+            'weightedMean': weighted_sum / participants if participants else None
+        },
+        'participants': {
+            'count': participants,
+            'target': target,
+            'ratio': participants / target if target else None
+        },
+        'sampleSizeReachedShare': reached / total if total else None
+    }, **breakdowns)
+
+
+@app.route('/api/experiments/stats', methods=['GET'])
+def get_experiment_stats():
+    etag = make_etag('experiment-stats', data_version('experiments'), sorted(request.args.items(multi=True)))
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    model = experiment_source(request.args)
+    query = apply_experiment_filters(db.session.query(model), request.args, model=model)
+    return add_validators(jsonify(experiment_stats(query, model)), etag)
+
+
+# Export
+EXPORT_BATCH_SIZE = 500
+
+# (CSV header, value getter) for the flattened CSV export; getters receive the
+# experiment row and its owners as user dicts
+EXPORT_CSV_COLUMNS = [
+    ('id', lambda e, owners: e.id),
+    ('name', lambda e, owners: e.name),
+    ('state', lambda e, owners: e.state),
+    ('experimentType', lambda e, owners: e.experiment_type),
+    ('stage', lambda e, owners: e.stage),
+    ('department', lambda e, owners: e.department),
+    ('impactValue', lambda e, owners: e.impact_value),
+    ('impactPositiveBound', lambda e, owners: e.impact_positive_bound),
+    ('impactNegativeBound', lambda e, owners: e.impact_negative_bound),
+    ('confidence', lambda e, owners: e.confidence),
+    ('progress', lambda e, owners: e.progress),
+    ('participantsCount', lambda e, owners: e.participants_count),
+    ('participantsTarget', lambda e, owners: e.participants_target),
+    ('sampleSizeReached', lambda e, owners: e.sample_size_reached),
+    ('durationWeeks', lambda e, owners: e.duration_weeks),
+    ('durationDays', lambda e, owners: e.duration_days),
+    ('significance', lambda e, owners: e.significance),
+    ('analysisType', lambda e, owners: e.analysis_type),
+    ('boundariesCrossed', lambda e, owners: ';'.join(boundaries_list(e))),
+    ('ownerIds', lambda e, owners: ';'.join(str(owner['id']) for owner in owners)),
+    ('ownerNames', lambda e, owners: ';'.join(owner['name'] for owner in owners)),
+    ('createdAt', lambda e, owners: isoformat(e.created_at) or ''),
+    ('updatedAt', lambda e, owners: isoformat(e.updated_at) or ''),
+]
+
+
+def iter_export_batches(query, model=Experiment):
+    """Yield lists of experiment column rows without materializing the result.
+
+    yield_per streams rows from the cursor EXPORT_BATCH_SIZE at a time, so
+    memory stays flat regardless of table size.
+    """
+    query = query.with_entities(*[getattr(model, column.key) for column in EXPERIMENT_COLUMNS]) \
+        .execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE)
+    batch = []
+    for row in query:
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_ndjson(query, model):
+    serializer = ExperimentRowSerializer()
+    for batch in iter_export_batches(query, model):
+        yield b'\n'.join(serializer.serialize(batch)) + b'\n'
+
+
+def export_csv(query, model):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, getter in EXPORT_CSV_COLUMNS])
+    yield buffer.getvalue()
+    for batch in iter_export_batches(query, model):
+        buffer.seek(0)
+        buffer.truncate()
+        owners = owner_links([row.id for row in batch])
+        users = user_fragments.get_many([i for ids in owners.values() for i in ids])
+        for row in batch:
+            row_owners = [users[i][0] for i in owners.get(row.id, []) if i in users]
+            writer.writerow([getter(row, row_owners) for header, getter in EXPORT_CSV_COLUMNS])
+        yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    'ndjson': (export_ndjson, 'application/x-ndjson'),
+    'csv': (export_csv, 'text/csv'),
+}
+
+
+@app.route('/api/experiments/export', methods=['GET'])
+def export_experiments():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be one of: ' + ', '.join(EXPORT_FORMATS)}), 400
+    generate, mimetype = EXPORT_FORMATS[export_format]
+
+    model = experiment_source(request.args)
+    query = apply_experiment_filters(db.session.query(model), request.args, model=model)
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+
+    headers = {'Content-Disposition': f'attachment; filename=experiments.{export_format}'}
+    return Response(stream_with_context(generate(query, model)), mimetype=mimetype, headers=headers)
+
+
+# Bulk operations
+#
+# Bulk endpoints take a JSON array or an NDJSON body (one object per line),
+# validate every item up front, resolve owners with one IN query per chunk
+# and write with executemany in a single transaction. Invalid items are
+# reported by index and skipped without aborting the rest of the batch.
+BULK_CHUNK_SIZE = 500
+
+
+def chunked(items, size):
+    """Yield successive lists of at most size items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def parse_bulk_body():
+    """Parse a bulk request body into (items, errors).
+
+    items is a list of (index, item); errors collects lines that are not
+    valid JSON. Accepts a JSON array or newline-delimited JSON.
+    """
+    body = request.get_data(as_text=True)
+    if body.lstrip().startswith('['):
+        try:
+            items = json.loads(body)
+        except ValueError as e:
+            raise ValueError(f'Invalid JSON body: {e}')
+        return list(enumerate(items)), []
+    items, errors = [], []
+    for index, line in enumerate(line for line in body.splitlines() if line.strip()):
+        try:
+            items.append((index, json.loads(line)))
+        except ValueError as e:
+            errors.append({'index': index, 'error': f'Invalid JSON: {e}'})
+    return items, errors
+
+
+def existing_ids(column, ids):
+    """Return the subset of ids present in column, querying in chunks."""
+    found = set()
+    for chunk in chunked(list(set(ids)), BULK_CHUNK_SIZE):
+        found.update(row[0] for row in db.session.execute(db.select(column).where(column.in_(chunk))))
+    return found
+
+
+def lock_experiments_for_write():
+    """Take the database write lock before allocating experiment ids.
+
+    Bumping the experiments version is a write, so on SQLite it acquires the
+    RESERVED lock; max(id) read afterwards cannot race another writer.
+    """
+    db.session.execute(
+        table_versions.update().where(table_versions.c.name == 'experiments')
+        .values(version=table_versions.c.version + 1)
+    )
+
+
+def last_experiment_id():
+    """Highest id in either store or in the retained change log.
+
+    Counting logged ids keeps a deleted id from being reused while change feed
+    clients may still hold it.
+    """
+    hot = db.session.query(func.max(Experiment.id)).scalar() or 0
+    cold = db.session.execute(db.select(func.max(experiments_archive.c.id))).scalar() or 0
+    logged = db.session.execute(db.select(func.max(change_log.c.experiment_id))).scalar() or 0
+    return max(hot, cold, logged)
+
+
+def next_experiment_id():
+    """First id above last_experiment_id(); call after lock_experiments_for_write()."""
+    return last_experiment_id() + 1
+
+
+def bulk_insert_experiments(items):
+    """Validate and insert experiments without committing.
+
+    items is a list of (index, payload). Returns (created, errors) where
+    created lists {'index', 'id'} for each inserted experiment.
+    """
+    rows, links, errors = [], [], []
+    parsed = []
+    for index, data in items:
+        try:
+            parsed.append((index, experiment_values(data), owner_ids_input(data) or []))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+
+    known_users = existing_ids(User.id, [i for _, _, owner_ids in parsed for i in owner_ids])
+    valid = []
+    for index, values, owner_ids in parsed:
+        missing = sorted(set(owner_ids) - known_users)
+        if missing:
+            errors.append({'index': index, 'error': f'Unknown owner ids: {missing}'})
+        else:
+            valid.append((index, values, owner_ids))
+    if not valid:
+        return [], errors
+
+    lock_experiments_for_write()
+    next_id = next_experiment_id()
+    created = []
+    for offset, (index, values, owner_ids) in enumerate(valid):
+        experiment_id = next_id + offset
+        rows.append(dict(values, id=experiment_id))
+        links.extend({'experiment_id': experiment_id, 'user_id': user_id}
+                     for user_id in dict.fromkeys(owner_ids))
+        created.append({'index': index, 'id': experiment_id})
+
+    for chunk in chunked(rows, BULK_CHUNK_SIZE):
+        db.session.execute(Experiment.__table__.insert(), chunk)
+    for chunk in chunked(links, BULK_CHUNK_SIZE):
+        db.session.execute(experiment_users.insert(), chunk)
+    return created, errors
+
+
+def bulk_update_experiments(items):
+    """Validate and apply partial updates without committing.
+
+    Each payload needs an id. Items for the same id are merged in request
+    order, so later items win as if applied one by one. Rows setting the same
+    columns are then written with one executemany UPDATE. Returns (updated
+    ids, each listed once, errors).
+    """
+    parsed, errors = [], []
+    for index, data in items:
+        try:
+            experiment_id = data.get('id') if isinstance(data, dict) else None
+            if not isinstance(experiment_id, int) or isinstance(experiment_id, bool):
+                raise ValueError('id is required')
+            parsed.append((index, experiment_id, experiment_changes(data), owner_ids_input(data)))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+
+    known_experiments = existing_ids(Experiment.id, [item[1] for item in parsed])
+    known_users = existing_ids(User.id, [i for item in parsed for i in (item[3] or [])])
+    merged, owner_updates, updated = {}, {}, []
+    for index, experiment_id, changes, owner_ids in parsed:
+        if experiment_id not in known_experiments:
+            errors.append({'index': index, 'error': f'Experiment {experiment_id} not found'})
+            continue
+        missing = sorted(set(owner_ids or []) - known_users)
+        if missing:
+            errors.append({'index': index, 'error': f'Unknown owner ids: {missing}'})
+            continue
+        merged.setdefault(experiment_id, {}).update(changes)
+        if owner_ids is not None:
+            owner_updates[experiment_id] = owner_ids
+        updated.append(experiment_id)
+
+    groups = {}
+    for experiment_id, changes in merged.items():
+        groups.setdefault(tuple(sorted(changes)), []).append(dict(changes, _id=experiment_id))
+
+    table = Experiment.__table__
+    for columns, params in groups.items():
+        statement = table.update().where(table.c.id == db.bindparam('_id')).values(
+            updated_at=func.now(), **{column: db.bindparam(column) for column in columns})
+        for chunk in chunked(params, BULK_CHUNK_SIZE):
+            db.session.execute(statement, chunk)
+
+    if owner_updates:
+        for chunk in chunked(list(owner_updates), BULK_CHUNK_SIZE):
+            db.session.execute(experiment_users.delete().where(experiment_users.c.experiment_id.in_(chunk)))
+        links = [{'experiment_id': experiment_id, 'user_id': user_id}
+                 for experiment_id, owner_ids in owner_updates.items()
+                 for user_id in dict.fromkeys(owner_ids)]
+        for chunk in chunked(links, BULK_CHUNK_SIZE):
+            db.session.execute(experiment_users.insert(), chunk)
+    return list(dict.fromkeys(updated)), errors
+
+
+def bulk_delete_experiments(items):
+    """Delete experiments by id without committing. Returns (deleted ids, errors)."""
+    ids, errors = [], []
+    for index, item in items:
+        experiment_id = item.get('id') if isinstance(item, dict) else item
+        if not isinstance(experiment_id, int) or isinstance(experiment_id, bool):
+            errors.append({'index': index, 'error': 'id is required'})
+        else:
+            ids.append((index, experiment_id))
+
+    known = existing_ids(Experiment.id, [experiment_id for _, experiment_id in ids])
+    deleted = []
+    for index, experiment_id in ids:
+        if experiment_id in known:
+            deleted.append(experiment_id)
+        else:
+            errors.append({'index': index, 'error': f'Experiment {experiment_id} not found'})
+    deleted = list(dict.fromkeys(deleted))
+
+    for chunk in chunked(deleted, BULK_CHUNK_SIZE):
+        db.session.execute(experiment_users.delete().where(experiment_users.c.experiment_id.in_(chunk)))
+        db.session.execute(Experiment.__table__.delete().where(Experiment.id.in_(chunk)))
+    return deleted, errors
+
+
+def run_bulk(operation, result_key):
+    """Parse the request body, run a bulk operation in one transaction and report."""
+    try:
+        items, errors = parse_bulk_body()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        done, item_errors = operation(items)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if done:
+        experiment_cache.invalidate()
+    errors = sorted(errors + item_errors, key=lambda error: error['index'])
+    return jsonify({result_key: done, 'errors': errors})
+
+
+@app.route('/api/experiments/bulk', methods=['POST'])
+def bulk_create_experiments():
+    return run_bulk(bulk_insert_experiments, 'created')
+
+
+@app.route('/api/experiments/bulk', methods=['PATCH'])
+def bulk_update_experiments_route():
+    if request.args.get('async') == 'true':
+        # Validated and applied by a bulk-update job, one transaction per chunk
+        try:
+            items, errors = parse_bulk_body()
+            return job_accepted(jobs.submit('bulk-update', {'items': items, 'errors': errors}))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except JobQueueFull:
+            return queue_full()
+    return run_bulk(bulk_update_experiments, 'updated')
+
+
+@app.route('/api/experiments/bulk', methods=['DELETE'])
+def bulk_delete_experiments_route():
+    return run_bulk(bulk_delete_experiments, 'deleted')
+
+# NDJSON import
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+
+def import_experiments(lines, chunk_size, progress=None):
+    """Import experiments from an iterable of NDJSON lines.
+
+    Lines are parsed one at a time and inserted chunk_size records per
+    transaction with bulk_insert_experiments, so memory is bounded by the
+    chunk size. Rejected lines are counted and the first
+    IMPORT_MAX_REPORTED_ERRORS are reported by line number. progress, if
+    given, is called with the running stats after each committed chunk.
+    """
+    started = time.perf_counter()
+    stats = {'lines': 0, 'imported': 0, 'rejected': 0, 'errors': []}
+
+    def reject(errors):
+        stats['rejected'] += len(errors)
+        room = IMPORT_MAX_REPORTED_ERRORS - len(stats['errors'])
+        stats['errors'].extend({'line': e['index'], 'error': e['error']} for e in errors[:max(room, 0)])
+
+    def flush(chunk):
+        try:
+            created, errors = bulk_insert_experiments(chunk)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        stats['imported'] += len(created)
+        reject(errors)
+        if progress is not None:
+            progress(stats)
+
+    chunk = []
+    try:
+        for line_number, line in enumerate(lines, start=1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            stats['lines'] += 1
+            try:
+                chunk.append((line_number, json.loads(line)))
+            except ValueError as e:
+                reject([{'index': line_number, 'error': f'Invalid JSON: {e}'}])
+                continue
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+    finally:
+        # Also reached when progress() cancels an import part way through
+        if stats['imported']:
+            experiment_cache.invalidate()
+
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    stats['rowsPerSecond'] = round(stats['imported'] / stats['seconds']) if stats['seconds'] else None
+    return stats
+
+
+@app.route('/api/experiments/import', methods=['POST'])
+def import_experiments_route():
+    try:
+        chunk_size = int(request.args.get('chunkSize', app.config['IMPORT_CHUNK_SIZE']))
+        if chunk_size < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'chunkSize must be a positive integer'}), 400
+    # Multipart upload (field "file") or a raw NDJSON request body
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    if request.args.get('async') == 'true':
+        return import_in_background(stream, chunk_size)
+    return jsonify(import_experiments(stream, chunk_size))
+
+
+def import_in_background(stream, chunk_size):
+    """Spool the upload to JOB_SPOOL_DIR and queue an import job for it."""
+    try:
+        job = jobs.create('import', {'chunkSize': chunk_size})
+    except JobQueueFull:
+        return queue_full()
+    path = spool_path(job.id)
+    try:
+        with open(path + '.part', 'wb') as spool:
+            while True:
+                block = stream.read(1 << 16)
+                if not block:
+                    break
+                spool.write(block)
+        os.replace(path + '.part', path)
+    except Exception:
+        if os.path.exists(path + '.part'):
+            os.remove(path + '.part')
+        jobs.cancel(job.id)
+        raise
+    jobs.start(job.id)
+    return job_accepted(job)
+
+
+@app.cli.command('import-experiments')
+@click.argument('source', type=click.File('rb'))
+@click.option('--chunk-size', type=int, default=None, help='Records per transaction.')
+def import_experiments_command(source, chunk_size):
+    """Import experiments from an NDJSON file ('-' for stdin)."""
+    stats = import_experiments(source, chunk_size or app.config['IMPORT_CHUNK_SIZE'])
+    click.echo(f"Imported {stats['imported']} of {stats['lines']} records in {stats['seconds']}s "
+               f"({stats['rowsPerSecond']} rows/s), rejected {stats['rejected']}")
+    for error in stats['errors']:
+        click.echo(f"  line {error['line']}: {error['error']}", err=True)
+
+
+# Group-sequential analysis
+#
+# Recomputes confidence, confidence intervals and crossed boundaries of all
+# running experiments in one vectorized pass. Each experiment's estimate is
+# impact_value with standard error impact_std_error (derived once from the
+# client-supplied bounds as a nominal two-sided interval). Group Sequential
+# experiments are tested against the O'Brien-Fleming or Pocock boundary of
+# the planned look they have reached (information fraction = participants
+# count / target) and get repeated confidence intervals at that boundary;
+# Fixed Horizon experiments use the nominal critical value and only cross a
+# boundary once their sample size is reached.
+BOUNDARY_FAMILIES = ('obrien-fleming', 'pocock')
+BOUNDARY_GRID_STEP = 0.025
+
+
+def normal_cdf(x):
+    """Standard normal CDF of an array (Abramowitz-Stegun 7.1.26, |error| < 1.5e-7)."""
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-z * z)
+    return 0.5 * (1.0 + np.sign(x) * erf)
+
+
+def normal_pdf(x):
+    return np.exp(-0.5 * x * x) / np.sqrt(2.0 * np.pi)
+
+
+def crossing_probability(critical_values):
+    """Null probability that |Z_k| >= critical_values[k] at some equally spaced look.
+
+    Numerical integration of the partial-sum density over the continuation
+    region (Armitage, McPherson and Rowe), trapezoid rule on a fixed grid.
+    """
+    total, density, grid, weights = 0.0, None, None, None
+    for look, critical in enumerate(critical_values, start=1):
+        bound = critical * np.sqrt(look)  # boundary on the partial sum S_k
+        points = int(np.ceil(2 * bound / BOUNDARY_GRID_STEP)) + 1
+        next_grid = np.linspace(-bound, bound, points)
+        next_weights = np.full(points, 2 * bound / (points - 1))
+        next_weights[[0, -1]] /= 2
+        if density is None:
+            total += 2 * (1 - normal_cdf(np.array(bound)))
+            density = normal_pdf(next_grid)
+        else:
+            mass = density * weights
+            total += mass @ (normal_cdf(-bound - grid) + 1 - normal_cdf(bound - grid))
+            density = normal_pdf(next_grid[:, None] - grid[None, :]) @ mass
+        grid, weights = next_grid, next_weights
+    return float(total)
+
+
+@functools.lru_cache(maxsize=32)
+def boundary_values(family, looks, alpha):
+    """Two-sided critical values (z scale) for looks equally spaced planned looks."""
+    if family not in BOUNDARY_FAMILIES:
+        raise ValueError(f"boundary must be one of {', '.join(BOUNDARY_FAMILIES)}")
+    if not 1 <= looks <= 20 or not 0 < alpha < 1:
+        raise ValueError('looks must be between 1 and 20 and alpha between 0 and 1')
+    shape = np.sqrt(looks / np.arange(1, looks + 1)) if family == 'obrien-fleming' else np.ones(looks)
+    low, high = NormalDist().inv_cdf(1 - alpha / 2), 8.0
+    for _ in range(40):  # bisection on the boundary constant
+        middle = (low + high) / 2
+        if crossing_probability(middle * shape) > alpha:
+            low = middle
+        else:
+            high = middle
+    return high * shape
+
+
+def analyze_experiments(columns, family, looks, alpha):
+    """Vectorized analysis of column arrays; returns new values and a validity mask."""
+    value = columns['impact_value']
+    nominal = NormalDist().inv_cdf(1 - alpha / 2)
+    std_error = np.where(np.isnan(columns['impact_std_error']),
+                         (columns['impact_positive_bound'] - columns['impact_negative_bound']) / (2 * nominal),
+                         columns['impact_std_error'])
+    target = columns['participants_target']
+    fraction = np.clip(np.divide(columns['participants_count'], target,
+                                 out=np.ones_like(value), where=target > 0), 0, 1)
+
+    boundaries = boundary_values(family, looks, alpha)
+    look = np.clip(np.ceil(fraction * looks).astype(int), 1, looks)
+    sequential = columns['experiment_type'] == 'Group Sequential'
+    critical = np.where(sequential, boundaries[look - 1], nominal)
+
+    valid = np.isfinite(value) & np.isfinite(std_error) & (std_error > 0)
+    safe_error = np.where(valid, std_error, 1.0)
+    z = value / safe_error
+    testable = valid & (sequential | (fraction >= 1))
+    efficacy = testable & (z >= critical)
+    harm = testable & (z <= -critical)
+    return {
+        'impact_std_error': std_error,
+        'confidence': np.round(100 * (2 * normal_cdf(np.abs(z)) - 1), 2),
+        'impact_positive_bound': np.round(value + critical * safe_error, 3),
+        'impact_negative_bound': np.round(value - critical * safe_error, 3),
+        'boundaries_crossed': np.where(efficacy, 'efficacy', np.where(harm, 'harm', '')),
+    }, valid
+
+
+def recompute_analysis(family=None, looks=None, alpha=None):
+    """Recompute all running experiments and bulk-update the rows that changed.
+
+    Commits, and returns {experiments, updated, skipped, crossed, seconds}.
+    """
+    started = time.perf_counter()
+    family = family or app.config['ANALYSIS_BOUNDARY']
+    looks = looks or app.config['ANALYSIS_LOOKS']
+    alpha = alpha or app.config['ANALYSIS_ALPHA']
+    boundary_values(family, looks, alpha)  # validate before taking the lock
+
+    table = Experiment.__table__
+    inputs = ['impact_value', 'impact_positive_bound', 'impact_negative_bound', 'impact_std_error',
+              'participants_count', 'participants_target', 'experiment_type']
+    outputs = ['impact_std_error', 'confidence', 'impact_positive_bound', 'impact_negative_bound',
+               'boundaries_crossed']
+    lock_experiments_for_write()
+    rows = db.session.execute(
+        db.select(table.c.id, table.c.confidence, table.c.boundaries_crossed, *[table.c[c] for c in inputs])
+        .where(table.c.state == 'Running')
+    ).all()
+    if not rows:
+        db.session.commit()
+        return {'experiments': 0, 'updated': 0, 'skipped': 0, 'crossed': 0,
+                'seconds': round(time.perf_counter() - started, 3)}
+
+    data = dict(zip(['id', 'confidence', 'boundaries_crossed'] + inputs, zip(*rows)))
+    columns = {name: np.array(data[name], dtype=float) for name in inputs[:-1]}
+    columns['experiment_type'] = np.array(data['experiment_type'], dtype=object)
+    results, valid = analyze_experiments(columns, family, looks, alpha)
+
+    current = {name: np.array(data[name], dtype=float) for name in
+               ['impact_std_error', 'confidence', 'impact_positive_bound', 'impact_negative_bound']}
+    changed = np.zeros(len(rows), dtype=bool)
+    for name, before in current.items():
+        changed |= ~np.isclose(results[name], before, rtol=0, atol=1e-9, equal_nan=True)
+    changed |= results['boundaries_crossed'] != np.array([b or '' for b in data['boundaries_crossed']], dtype=object)
+    changed &= valid
+
+    params = [dict({'_id': data['id'][i]}, **{name: results[name][i].item() for name in outputs})
+              for i in np.flatnonzero(changed)]
+    statement = table.update().where(table.c.id == db.bindparam('_id')).values(
+        updated_at=func.now(), **{name: db.bindparam(name) for name in outputs})
+    for chunk in chunked(params, BULK_CHUNK_SIZE):
+        db.session.execute(statement, chunk)
+    db.session.commit()
+    if params:
+        experiment_cache.invalidate()
+    return {
+        'experiments': len(rows),
+        'updated': len(params),
+        'skipped': int((~valid).sum()),
+        'crossed': int((valid & (results['boundaries_crossed'] != '')).sum()),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+@app.route('/api/experiments/analysis', methods=['POST'])
+def recompute_analysis_route():
+    """Run the analysis engine; optional boundary, looks and alpha query args."""
+    try:
+        looks = request.args.get('looks', type=int)
+        alpha = request.args.get('alpha', type=float)
+        stats = recompute_analysis(request.args.get('boundary'), looks, alpha)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(stats)
+
+
+@app.cli.command('recompute-analysis')
+@click.option('--boundary', type=click.Choice(BOUNDARY_FAMILIES), default=None)
+@click.option('--looks', type=int, default=None)
+@click.option('--alpha', type=float, default=None)
+def recompute_analysis_command(boundary, looks, alpha):
+    """Recompute confidence, intervals and crossed boundaries of running experiments."""
+    try:
+        stats = recompute_analysis(boundary, looks, alpha)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    print(json.dumps(stats))
+
+
+# Archival
+#
+# archive_experiments moves experiments in ARCHIVE_STATES from the hot table
+# to experiments_archive: the row is copied, then deleted from the hot table.
+# The hot-table triggers that clean up owners' search entries, boundaries and
+# metric history skip rows present in the cold store (NOT_ARCHIVED), so
+# derived data stays in place; restore_experiments moves rows back the same
+# way. Archived experiments are read-only until restored, and deleting one
+# from the cold store removes its derived rows (experiments_archive_ad).
+GUARDED_TRIGGERS = ['experiments_fts_ad', 'experiment_boundaries_ad', 'metric_history_insert', 'metric_history_delete']
+
+
+def archive_enabled():
+    """Whether experiments can be moved between the stores (SQLite triggers)."""
+    return db.engine.dialect.name == 'sqlite'
+
+
+def init_archive():
+    """Create the cold-store delete trigger and guard the hot-table triggers.
+
+    Databases created before archival have unguarded cleanup triggers; they
+    are dropped and recreated by the init functions that own them.
+    """
+    if not archive_enabled():
+        app.logger.warning('Archival is only supported on SQLite')
+        return
+    with db.engine.begin() as conn:
+        stale = [name for name, sql in conn.exec_driver_sql(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({})".format(
+                ', '.join(f"'{name}'" for name in GUARDED_TRIGGERS)))
+            if 'experiments_archive' not in sql]
+        for name in stale:
+            conn.exec_driver_sql(f'DROP TRIGGER {name}')
+    if stale:
+        init_search()
+        init_boundary_index()
+        init_metric_history()
+
+    cleanup = ['DELETE FROM experiment_users WHERE experiment_id = OLD.id;',
+               'DELETE FROM experiment_boundaries WHERE experiment_id = OLD.id;',
+               'DELETE FROM experiment_metric_history WHERE experiment_id = OLD.id;']
+    if fts_enabled():
+        cleanup.append('DELETE FROM experiments_fts WHERE rowid = OLD.id;')
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(
+            'CREATE TRIGGER IF NOT EXISTS experiments_archive_ad AFTER DELETE ON experiments_archive '
+            'WHEN NOT EXISTS (SELECT 1 FROM experiments WHERE id = OLD.id) BEGIN '
+            + ' '.join(cleanup) + ' END'
+        )
+
+
+def is_archived(experiment_id):
+    """Whether the experiment is in the cold store."""
+    return db.session.execute(
+        db.select(experiments_archive.c.id).where(experiments_archive.c.id == experiment_id)
+    ).first() is not None
+
+
+@contextlib.contextmanager
+def move_connection():
+    """Engine connection for moving rows between the stores.
+
+    experiment_users and experiment_boundaries reference the hot table but
+    keep the rows of archived experiments, so foreign key enforcement is off
+    while the original row is deleted (PRAGMA foreign_keys only takes effect
+    outside a transaction).
+    """
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA foreign_keys = OFF')
+        try:
+            yield conn
+        finally:
+            conn.exec_driver_sql('PRAGMA foreign_keys = {}'.format(app.config['SQLITE_PRAGMAS']['foreign_keys']))
+
+
+def move_experiments(condition, source, target, progress=None):
+    """Move the source rows matching condition to target, one batch per transaction.
+
+    progress(moved, total) is called after each batch. Returns the moved ids.
+    """
+    if not archive_enabled():
+        raise RuntimeError('Archival is only supported on SQLite')
+    names = [column.name for column in Experiment.__table__.columns]
+    total = db.session.execute(db.select(func.count()).select_from(source).where(condition)).scalar()
+    db.session.commit()
+    moved = []
+    while True:
+        with move_connection() as conn, conn.begin():
+            # Take the write lock before choosing the batch
+            conn.execute(table_versions.update().where(table_versions.c.name == 'experiments')
+                         .values(version=table_versions.c.version + 1))
+            batch = conn.execute(db.select(source.c.id).where(condition).order_by(source.c.id)
+                                 .limit(app.config['ARCHIVE_BATCH_SIZE'])).scalars().all()
+            if batch:
+                conn.execute(target.insert().from_select(
+                    names, db.select(*[source.c[name] for name in names]).where(source.c.id.in_(batch))))
+                conn.execute(source.delete().where(source.c.id.in_(batch)))
+        if not batch:
+            return moved
+        moved.extend(batch)
+        experiment_cache.invalidate()
+        if progress is not None:
+            progress(len(moved), max(total, len(moved)))
+
+
+def archive_experiments(ids=None, older_than_days=None, progress=None):
+    """Move experiments in ARCHIVE_STATES to the cold store.
+
+    With ids, those experiments (if in an archivable state); otherwise all
+    unchanged for older_than_days (default ARCHIVE_AFTER_DAYS). Returns the
+    moved ids.
+    """
+    hot = Experiment.__table__
+    condition = hot.c.state.in_(app.config['ARCHIVE_STATES'])
+    if ids is not None:
+        condition &= hot.c.id.in_(ids)
+    else:
+        days = app.config['ARCHIVE_AFTER_DAYS'] if older_than_days is None else older_than_days
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+        condition &= func.coalesce(hot.c.updated_at, hot.c.created_at) <= cutoff
+    return move_experiments(condition, hot, experiments_archive, progress)
+
+
+def restore_experiments(ids):
+    """Move archived experiments back to the hot table. Returns the moved ids."""
+    return move_experiments(experiments_archive.c.id.in_(ids), experiments_archive, Experiment.__table__)
+
+
+@app.route('/api/experiments/<int:experiment_id>/archive', methods=['POST'])
+def archive_experiment(experiment_id):
+    """Move one experiment to the cold store now; it must be in ARCHIVE_STATES."""
+    if not is_archived(experiment_id):
+        state = db.session.query(Experiment.state).filter(Experiment.id == experiment_id).first_or_404()[0]
+        if state not in app.config['ARCHIVE_STATES']:
+            return jsonify({'error': 'Only experiments in states {} can be archived'.format(
+                ', '.join(app.config['ARCHIVE_STATES']))}), 409
+        db.session.commit()
+        try:
+            archive_experiments(ids=[experiment_id])
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 501
+    experiment = load_experiment(experiment_id, all_experiments)
+    return jsonify(dict(experiment.to_dict(), archived=True))
+
+
+@app.route('/api/experiments/<int:experiment_id>/restore', methods=['POST'])
+def restore_experiment(experiment_id):
+    """Move an archived experiment back to the hot table so it can be edited."""
+    if is_archived(experiment_id):
+        db.session.commit()
+        try:
+            restore_experiments([experiment_id])
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 501
+    experiment = load_experiment(experiment_id)
+    return jsonify(dict(experiment.to_dict(), archived=False))
+
+
+@app.cli.command('archive-experiments')
+@click.option('--older-than-days', type=float, default=None,
+              help='Archive experiments unchanged for this many days (default ARCHIVE_AFTER_DAYS).')
+def archive_experiments_command(older_than_days):
+    """Move experiments in ARCHIVE_STATES to the cold store, e.g. nightly from cron."""
+    started = time.perf_counter()
+    try:
+        moved = archive_experiments(older_than_days=older_than_days)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    print(json.dumps({'archived': len(moved), 'seconds': round(time.perf_counter() - started, 3)}))
+
+
+@app.cli.command('restore-experiments')
+@click.argument('ids', nargs=-1, type=int, required=True)
+def restore_experiments_command(ids):
+    """Move archived experiments back to the hot table."""
+    try:
+        moved = restore_experiments(list(ids))
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    print(json.dumps({'restored': moved}))
+
+
+# Background jobs
+#
+# Heavy operations run on a per-process thread pool (JOB_WORKERS threads)
+# instead of the request thread. Jobs are rows in the jobs table, so any
+# gunicorn worker can report status or accept a cancellation; the pool of
+# the process that accepted a job runs it. Handlers report progress between
+# transactions, which is also where cancellation takes effect: work already
+# committed by a cancelled job is kept.
+JOB_FINISHED = ('succeeded', 'failed', 'cancelled')
+JOB_HANDLERS = {}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def job_handler(kind):
+    """Register handler(context, params) -> JSON-serializable result for a job kind."""
+    def register(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+class JobContext:
+    """Passed to job handlers for progress reporting and cancellation."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def progress(self, fraction, message=None):
+        """Record progress (0..1); raises JobCancelled if cancellation was requested.
+
+        Call between transactions: it writes through its own connection.
+        """
+        jobs_table = Job.__table__
+        with db.engine.begin() as conn:
+            conn.execute(jobs_table.update().where(jobs_table.c.id == self.job_id)
+                         .values(progress=round(min(max(fraction, 0.0), 1.0), 4), message=message))
+            cancel = conn.execute(db.select(jobs_table.c.cancel_requested)
+                                  .where(jobs_table.c.id == self.job_id)).scalar()
+        if cancel:
+            raise JobCancelled()
+
 
-# Initialize Flask app
-app = Flask(__name__)
-app.wsgi_app = ProxyFix(app.wsgi_app)
-CORS(app)
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
 
-# Configure SQLite database (will be created in current directory)
-basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'commercial_ai_experiments.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-# Initialize database
-db = SQLAlchemy(app)
+class JobRunner:
+    """Runs queued jobs on a lazily created, fork-safe thread pool."""
 
-# Define database models
-class User(db.Model):
-    __tablename__ = 'users'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(100), unique=True, nullable=False)
-    department = db.Column(db.String(100), default='')
-    profile_picture = db.Column(db.String(255), default='')
-    created_at = db.Column(db.DateTime, default=func.now())
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'email': self.email,
-            'department': self.department,
-            'profile_picture': self.profile_picture,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    def executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # A pool inherited through fork has no threads; start a new one
+                self._executor = ThreadPoolExecutor(app.config['JOB_WORKERS'], thread_name_prefix='job')
+                self._pid = os.getpid()
+            return self._executor
 
-# Association table for many-to-many relationship between experiments and users
-experiment_users = db.Table('experiment_users',
-    db.Column('experiment_id', db.Integer, db.ForeignKey('experiments.id'), primary_key=True),
-    db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True)
-)
+    def submit(self, kind, params=None):
+        """Queue a job and return it; raises JobQueueFull past JOB_MAX_PENDING."""
+        job = self.create(kind, params)
+        self.start(job.id)
+        return job
 
-class Experiment(db.Model):
-    __tablename__ = 'experiments'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    state = db.Column(db.String(20), default='Running')  # Running, Stopped, Completed, Archived
-    experiment_type = db.Column(db.String(50), nullable=False)  # Fixed Horizon, Group Sequential
-    stage = db.Column(db.String(50), default='Discovery')  # Discovery, Pre-launch, Phase 1, etc.
-    department = db.Column(db.String(50), default='')  # Marketing, Sales, Procurement, etc.
-    
-    # Impact data stored as JSON
-    impact_value = db.Column(db.Float, default=0)
-    impact_positive_bound = db.Column(db.Float, default=0)
-    impact_negative_bound = db.Column(db.Float, default=0)
-    
-    confidence = db.Column(db.Float, default=0)
-    progress = db.Column(db.Float, default=0)
-    
-    # Participants data
-    participants_count = db.Column(db.Integer, default=0)
-    participants_target = db.Column(db.Integer, default=30)
-    sample_size_reached = db.Column(db.Boolean, default=False)
-    
-    # Duration data
-    duration_weeks = db.Column(db.Integer, default=8)
-    duration_days = db.Column(db.Integer, default=0)
-    
-    significance = db.Column(db.String(20), default='Medium')  # Low, Medium, High
-    analysis_type = db.Column(db.String(50), default='A/B Test')  # A/B Test, Multivariate, Feature Flag, Custom
-    
-    boundaries_crossed = db.Column(db.String(255), default='')  # Comma-separated list of crossed boundaries
-    
-    created_at = db.Column(db.DateTime, default=func.now())
-    updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
-    
-    # Relationships
-    owners = db.relationship('User', secondary=experiment_users, backref=db.backref('experiments', lazy='dynamic'))
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'state': self.state,
-            'experimentType': self.experiment_type,
-            'stage': self.stage,
-            'department': self.department,
-            'impact': {
-                'value': self.impact_value,
-                'positiveBound': self.impact_positive_bound,
-                'negativeBound': self.impact_negative_bound
-            },
-            'confidence': self.confidence,
-            'progress': self.progress,
-            'participants': {
-                'count': self.participants_count,
-                'target': self.participants_target,
-                'sampleSizeReached': self.sample_size_reached
-            },
-            'duration': {
-                'weeks': self.duration_weeks,
-                'days': self.duration_days
-            },
-            'significance': self.significance,
-            'analysisType': self.analysis_type,
-            'boundariesCrossed': self.boundaries_crossed.split(',') if self.boundaries_crossed else [],
-            'owners': [owner.to_dict() for owner in self.owners],
-            'createdAt': self.created_at.isoformat() if self.created_at else None,
-            'updatedAt': self.updated_at.isoformat() if self.updated_at else None
-        }
+    def create(self, kind, params=None):
+        """Record a queued job without starting it (see start)."""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"kind must be one of {', '.join(sorted(JOB_HANDLERS))}")
+        self.prune()
+        pending = Job.query.filter(Job.status.in_(['queued', 'running'])).count()
+        if pending >= app.config['JOB_MAX_PENDING']:
+            raise JobQueueFull()
+        job = Job(kind=kind, params=json.dumps(params or {}), worker=worker_name())
+        db.session.add(job)
+        db.session.commit()
+        return job
 
-# API Routes
-@app.route('/api/experiments', methods=['GET'])
-def get_experiments():
-    # Get filter parameters
-    state = request.args.get('state')
-    significance = request.args.get('significance')
-    owner_id = request.args.get('owner')
-    analysis_type = request.args.get('analysisType')
-    stage = request.args.get('stage')
-    department = request.args.get('department')
-    search = request.args.get('search', '')
-    
-    # Start with base query
-    query = Experiment.query
-    
-    # Apply filters
-    if state and state != 'Any':
-        query = query.filter(Experiment.state == state)
-    if significance and significance != 'Any':
-        query = query.filter(Experiment.significance == significance)
-    if analysis_type and analysis_type != 'Any':
-        query = query.filter(Experiment.analysis_type == analysis_type)
-    if stage and stage != 'Any':
-        query = query.filter(Experiment.stage == stage)
-    if department and department != 'Any':
-        query = query.filter(Experiment.department == department)
-    if owner_id and owner_id != 'Any':
-        query = query.filter(Experiment.owners.any(User.id == owner_id))
-    if search:
-        query = query.filter(Experiment.name.ilike(f'%{search}%'))
-    
-    # Sort by created_at in descending order (newest first)
-    query = query.order_by(Experiment.created_at.desc())
-    
-    # Execute query
-    experiments = query.all()
-    
-    # Convert to dictionary
-    result = [exp.to_dict() for exp in experiments]
-    
-    return jsonify(experiments=result, total=len(result))
+    def start(self, job_id):
+        self.executor().submit(self.run, job_id)
 
-@app.route('/api/experiments/<int:experiment_id>', methods=['GET'])
-def get_experiment(experiment_id):
-    experiment = Experiment.query.get_or_404(experiment_id)
-    return jsonify(experiment.to_dict())
+    def run(self, job_id):
+        jobs_table = Job.__table__
+        with app.app_context():
+            with db.engine.begin() as conn:
+                claimed = conn.execute(
+                    jobs_table.update()
+                    .where(jobs_table.c.id == job_id, jobs_table.c.status == 'queued')
+                    .values(status='running', started_at=func.now())
+                ).rowcount
+            if not claimed:  # cancelled while queued
+                return
+            job = db.session.get(Job, job_id)
+            kind, params = job.kind, json.loads(job.params or '{}')
+            db.session.rollback()
+            values = {}
+            try:
+                result = JOB_HANDLERS[kind](JobContext(job_id), params)
+                values = {'status': 'succeeded', 'progress': 1.0, 'result': json.dumps(result)}
+            except JobCancelled:
+                db.session.rollback()
+                values = {'status': 'cancelled'}
+            except Exception as e:
+                db.session.rollback()
+                app.logger.exception('Job %s (%s) failed', job_id, kind)
+                values = {'status': 'failed', 'error': str(e) or type(e).__name__}
+            finally:
+                with db.engine.begin() as conn:
+                    conn.execute(jobs_table.update().where(jobs_table.c.id == job_id)
+                                 .values(finished_at=func.now(), **values))
 
-@app.route('/api/experiments', methods=['POST'])
-def create_experiment():
-    data = request.json
-    
-    # Extract nested fields
-    impact = data.get('impact', {})
-    participants = data.get('participants', {})
-    duration = data.get('duration', {})
-    owner_ids = data.get('owners', [])
-    
-    # Create experiment
-    experiment = Experiment(
-        name=data.get('name', 'New Experiment'),
-        state=data.get('state', 'Running'),
-        experiment_type=data.get('experimentType', 'Fixed Horizon'),
-        stage=data.get('stage', 'Discovery'),
-        department=data.get('department', 'Marketing'),
-        impact_value=impact.get('value', 0),
-        impact_positive_bound=impact.get('positiveBound', 0),
-        impact_negative_bound=impact.get('negativeBound', 0),
-        confidence=data.get('confidence', 0),
-        progress=data.get('progress', 0),
-        participants_count=participants.get('count', 0),
-        participants_target=participants.get('target', 30),
-        sample_size_reached=participants.get('sampleSizeReached', False),
-        duration_weeks=duration.get('weeks', 8),
-        duration_days=duration.get('days', 0),
-        significance=data.get('significance', 'Medium'),
-        analysis_type=data.get('analysisType', 'A/B Test')
-    )
-    
-    # Add owners
-    if owner_ids:
-        owners = User.query.filter(User.id.in_(owner_ids)).all()
-        for owner in owners:
-            experiment.owners.append(owner)
-    
-    db.session.add(experiment)
-    db.session.commit()
-    
-    return jsonify(experiment.to_dict()), 201
+    def cancel(self, job_id):
+        """Cancel a queued job, or ask a running one to stop at its next progress report."""
+        jobs_table = Job.__table__
+        with db.engine.begin() as conn:
+            cancelled = conn.execute(
+                jobs_table.update()
+                .where(jobs_table.c.id == job_id, jobs_table.c.status == 'queued')
+                .values(status='cancelled', finished_at=func.now())
+            ).rowcount
+            if not cancelled:
+                conn.execute(jobs_table.update()
+                             .where(jobs_table.c.id == job_id, jobs_table.c.status == 'running')
+                             .values(cancel_requested=True))
+        if cancelled:
+            remove_spool_file(job_id)
 
-@app.route('/api/experiments/<int:experiment_id>', methods=['PUT'])
-def update_experiment(experiment_id):
-    experiment = Experiment.query.get_or_404(experiment_id)
-    data = request.json
-    
-    # Update simple fields
-    if 'name' in data:
-        experiment.name = data['name']
-    if 'state' in data:
-        experiment.state = data['state']
-    if 'experimentType' in data:
-        experiment.experiment_type = data['experimentType']
-    if 'stage' in data:
-        experiment.stage = data['stage']
-    if 'department' in data:
-        experiment.department = data['department']
-    if 'confidence' in data:
-        experiment.confidence = data['confidence']
-    if 'progress' in data:
-        experiment.progress = data['progress']
-    if 'significance' in data:
-        experiment.significance = data['significance']
-    if 'analysisType' in data:
-        experiment.analysis_type = data['analysisType']
-    
-    # Update nested fields
-    if 'impact' in data:
-        impact = data['impact']
-        if 'value' in impact:
-            experiment.impact_value = impact['value']
-        if 'positiveBound' in impact:
-            experiment.impact_positive_bound = impact['positiveBound']
-        if 'negativeBound' in impact:
-            experiment.impact_negative_bound = impact['negativeBound']
-    
-    if 'participants' in data:
-        participants = data['participants']
-        if 'count' in participants:
-            experiment.participants_count = participants['count']
-        if 'target' in participants:
-            experiment.participants_target = participants['target']
-        if 'sampleSizeReached' in participants:
-            experiment.sample_size_reached = participants['sampleSizeReached']
-    
-    if 'duration' in data:
-        duration = data['duration']
-        if 'weeks' in duration:
-            experiment.duration_weeks = duration['weeks']
-        if 'days' in duration:
-            experiment.duration_days = duration['days']
-    
-    # Update boundaries crossed
-    if 'boundariesCrossed' in data:
-        experiment.boundaries_crossed = ','.join(data['boundariesCrossed'])
-    
-    # Update owners if provided
-    if 'owners' in data:
-        owner_ids = data['owners']
-        experiment.owners = []  # Clear existing owners
-        
-        if owner_ids:
-            owners = User.query.filter(User.id.in_(owner_ids)).all()
-            for owner in owners:
-                experiment.owners.append(owner)
-    
-    # Update timestamp
-    experiment.updated_at = func.now()
-    
-    db.session.commit()
-    return jsonify(experiment.to_dict())
+    def prune(self):
+        """Delete finished jobs older than JOB_RETENTION_DAYS."""
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=app.config['JOB_RETENTION_DAYS'])
+        Job.query.filter(Job.status.in_(JOB_FINISHED), Job.finished_at < cutoff) \
+            .delete(synchronize_session=False)
 
-@app.route('/api/experiments/<int:experiment_id>', methods=['DELETE'])
-def delete_experiment(experiment_id):
-    experiment = Experiment.query.get_or_404(experiment_id)
-    db.session.delete(experiment)
+
+jobs = JobRunner()
+
+
+def fail_orphaned_jobs():
+    """Mark queued/running jobs whose process on this host is gone as failed."""
+    host = socket.gethostname()
+    orphaned = []
+    for job in Job.query.filter(Job.status.in_(['queued', 'running'])):
+        job_host, _, pid = (job.worker or '').rpartition(':')
+        if job_host != host:
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except (ValueError, ProcessLookupError):
+            orphaned.append(job.id)
+        except PermissionError:
+            pass  # alive, owned by another user
+    if orphaned:
+        Job.query.filter(Job.id.in_(orphaned)).update(
+            {'status': 'failed', 'error': 'Interrupted: the worker process exited',
+             'finished_at': func.now()}, synchronize_session=False)
     db.session.commit()
-    return jsonify({'message': 'Experiment deleted successfully'})
+    for job_id in orphaned:
+        remove_spool_file(job_id)
+
+
+def spool_path(job_id):
+    return os.path.join(app.config['JOB_SPOOL_DIR'], f'commercial-ai-job-{job_id}.ndjson')
+
+
+def remove_spool_file(job_id):
+    try:
+        os.remove(spool_path(job_id))
+    except FileNotFoundError:
+        pass
+
+
+@job_handler('analysis')
+def analysis_job(context, params):
+    context.progress(0.0, 'Recomputing running experiments')
+    return recompute_analysis(params.get('boundary'), params.get('looks'), params.get('alpha'))
+
+
+@job_handler('sample-size')
+def sample_size_job(context, params):
+    """Set sample_size_reached from participant counts, one id range per transaction."""
+    table = Experiment.__table__
+    reached = table.c.participants_count >= table.c.participants_target
+    batch = int(params.get('batchSize') or 5000)
+    max_id = db.session.query(func.max(table.c.id)).scalar() or 0
+    updated = 0
+    for low in range(0, max_id + 1, batch):
+        updated += db.session.execute(
+            table.update()
+            .where(table.c.id >= low, table.c.id < low + batch,
+                   db.or_(table.c.sample_size_reached.is_(None), table.c.sample_size_reached != reached))
+            .values(sample_size_reached=reached, updated_at=func.now())
+        ).rowcount
+        db.session.commit()
+        if updated:
+            experiment_cache.invalidate()
+        context.progress(min(low + batch, max_id + 1) / (max_id + 1), f'{updated} updated')
+    return {'updated': updated}
+
+
+@job_handler('bulk-update')
+def bulk_update_job(context, params):
+    """bulk_update_experiments in BULK_CHUNK_SIZE transactions with progress."""
+    items = [(index, item) for index, item in params.get('items', [])]
+    # Ordered set: an id updated in several chunks is reported once
+    updated, errors = {}, list(params.get('errors', []))
+    for done, chunk in enumerate(chunked(items, BULK_CHUNK_SIZE), start=1):
+        try:
+            chunk_updated, chunk_errors = bulk_update_experiments(chunk)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        updated.update(dict.fromkeys(chunk_updated))
+        errors.extend(chunk_errors)
+        if chunk_updated:
+            experiment_cache.invalidate()
+        context.progress(min(done * BULK_CHUNK_SIZE, len(items)) / len(items), f'{len(updated)} updated')
+    return {'updated': list(updated), 'errors': sorted(errors, key=lambda error: error['index'])}
+
+
+@job_handler('import')
+def import_job(context, params):
+    """Import the NDJSON body spooled by the import endpoint, then delete it."""
+    path = spool_path(context.job_id)
+    try:
+        size = os.path.getsize(path) or 1
+        with open(path, 'rb') as source:
+            return import_experiments(
+                source, params.get('chunkSize') or app.config['IMPORT_CHUNK_SIZE'],
+                progress=lambda stats: context.progress(source.tell() / size, f"{stats['imported']} imported"))
+    finally:
+        remove_spool_file(context.job_id)
+
+
+@job_handler('archive')
+def archive_job(context, params):
+    """archive_experiments on a schedule: POST /api/jobs with kind archive."""
+    context.progress(0.0, 'Archiving experiments')
+    moved = archive_experiments(
+        older_than_days=params.get('olderThanDays'),
+        progress=lambda count, total: context.progress(count / total, f'{count} archived'))
+    return {'archived': len(moved)}
+
+
+def job_accepted(job):
+    """202 response for a queued job, pointing at its status URL."""
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job.id}'
+    return response
+
+
+def queue_full():
+    response = jsonify({'error': 'Too many pending jobs, try again later'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '30'
+    return response
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a job: {"kind": "analysis" | "sample-size" | "bulk-update" | "archive", "params": {...}}."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('params', {}), dict):
+        return jsonify({'error': 'Expected a JSON object with kind and params'}), 400
+    if data.get('kind') == 'import':
+        return jsonify({'error': 'Submit imports with POST /api/experiments/import?async=true'}), 400
+    # Imports read a spooled request body, so they are queued by the import endpoint only
+    kinds = sorted(kind for kind in JOB_HANDLERS if kind != 'import')
+    if data.get('kind') not in kinds:
+        return jsonify({'error': f"kind must be one of {', '.join(kinds)}"}), 400
+    try:
+        return job_accepted(jobs.submit(data.get('kind'), data.get('params')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except JobQueueFull:
+        return queue_full()
+
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    query = Job.query
+    status = request.args.get('status')
+    if status:
+        query = query.filter(Job.status == status)
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify([job.to_dict() for job in query.order_by(Job.id.desc()).limit(limit)])
+
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    return jsonify(Job.query.get_or_404(job_id).to_dict())
+
+
+@app.route('/api/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    Job.query.get_or_404(job_id)
+    jobs.cancel(job_id)
+    db.session.expire_all()
+    return jsonify(Job.query.get(job_id).to_dict())
+
+
+@app.route('/api/jobs/<int:job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = Job.query.get_or_404(job_id)
+    if job.status != 'succeeded':
+        return jsonify(dict(job.to_dict(), error=job.error or f'Job is {job.status}')), 409
+    return Response(job.result, mimetype='application/json')
+
+
+@app.route('/api/experiments/changes', methods=['GET'])
+def get_experiment_changes():
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'seq': change_seq()})
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(changes_since(since, limit))
+
+
+def sse_event(event, data, event_id=None):
+    """Format one Server-Sent Events message."""
+    message = f'event: {event}\n'
+    if event_id is not None:
+        message += f'id: {event_id}\n'
+    return message + f'data: {json.dumps(data)}\n\n'
+
+
+change_stream_slots = threading.BoundedSemaphore(app.config['CHANGE_STREAM_MAX_CLIENTS'])
+
+
+@app.route('/api/experiments/changes/stream', methods=['GET'])
+def stream_experiment_changes():
+    """Push change feed deltas as Server-Sent Events.
+
+    Resumes from Last-Event-ID (sent by EventSource on reconnect) or ?since=.
+    Streams end after CHANGE_STREAM_MAX_SECONDS so workers are recycled; the
+    browser reconnects automatically from the last event id. Each stream holds
+    a worker thread, so beyond CHANGE_STREAM_MAX_CLIENTS per process clients get
+    503 and should poll GET /api/experiments/changes instead.
+    """
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    if since is None:
+        since = change_seq()
+    poll = app.config['CHANGE_STREAM_POLL_SECONDS']
+    deadline = time.monotonic() + app.config['CHANGE_STREAM_MAX_SECONDS']
+
+    def generate(since):
+        yield 'retry: 2000\n\n'
+        last_heartbeat = time.monotonic()
+        while time.monotonic() < deadline:
+            if change_seq() > since:
+                while True:
+                    changes = changes_since(since, MAX_PAGE_SIZE)
+                    since = changes['seq']
+                    yield sse_event('changes', changes, since)
+                    if not changes['hasMore']:
+                        break
+                last_heartbeat = time.monotonic()
+            elif time.monotonic() - last_heartbeat > 15:
+                yield ': keepalive\n\n'
+                last_heartbeat = time.monotonic()
+            # End the read transaction so the next poll sees new commits
+            db.session.close()
+            time.sleep(poll)
+
+    # Take the slot only once nothing before the stream can raise; closing the
+    # response gives it back
+    if not change_stream_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many change streams, poll /api/experiments/changes instead'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    response = Response(stream_with_context(generate(since)), mimetype='text/event-stream', headers=headers)
+    response.call_on_close(change_stream_slots.release)
+    return response
+
 
 @app.route('/api/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    # Counts change with ownership, which bumps the experiments version
+    etag = make_etag('users', data_version('users'), data_version('experiments'))
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    # Users with their experiment counts in one grouped query
+    rows = db.session.query(User, func.count(experiment_users.c.experiment_id)) \
+        .outerjoin(experiment_users, experiment_users.c.user_id == User.id) \
+        .group_by(User.id).order_by(User.id).all()
+    return add_validators(jsonify([dict(user.to_dict(), experimentCount=count) for user, count in rows]), etag)
+
+
+@app.route('/api/users/<int:user_id>/experiments', methods=['GET'])
+def get_user_experiments(user_id):
+    """Experiments owned by a user, with the listing's filters and pagination."""
+    db.session.query(User.id).filter(User.id == user_id).first_or_404()
+    args = request.args.copy()
+    args['owner'] = str(user_id)
+    return experiment_listing_response(args)
+
+# Request metrics
+#
+# Every request records its latency, SQL query count and time (through
+# cursor events on all engines), time spent serializing and response size
+# per endpoint rule. /metrics exposes them in the Prometheus text format,
+# responses carry a Server-Timing header, and requests slower than
+# SLOW_REQUEST_MS are logged with their statements. Streamed responses
+# (export, change stream) are measured up to the start of the stream.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100)
+SLOW_LOG_MAX_STATEMENTS = 50
+METRICS_FLUSH_SECONDS = 5
+
+METRIC_HELP = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint rule.'),
+    'db_queries_per_request': ('histogram', 'SQL statements executed per request.'),
+    'db_query_duration_seconds_total': ('counter', 'Time spent in SQL statements.'),
+    'serialization_duration_seconds_total': ('counter', 'Time spent serializing responses.'),
+    'http_response_bytes_total': ('counter', 'Response body bytes (non-streamed).'),
+    'http_slow_requests_total': ('counter', 'Requests slower than SLOW_REQUEST_MS.'),
+    'listing_coalesce_total': ('counter', 'Listing renders by coalescing outcome (leader, coalesced, timeout, error).'),
+}
+# Label names of metrics not labelled by endpoint, method and status
+METRIC_LABELS = {
+    'listing_coalesce_total': ('outcome',),
+}
+
+
+class RequestMetrics:
+    """Thread-safe per-process counters and histograms keyed by name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self._publisher_pid = None
+
+    def inc(self, name, labels, amount=1.0):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + amount
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (last one is +Inf), then sum and count
+                histogram = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+            histogram[bisect.bisect_left(buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+    def start_publisher(self):
+        """Start (once per process) the thread that publishes snapshots to METRICS_DIR."""
+        if not app.config['METRICS_DIR'] or self._publisher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._publisher_pid == os.getpid():
+                return
+            self._publisher_pid = os.getpid()
+        threading.Thread(target=self._publish_forever, name='metrics-publisher', daemon=True).start()
+
+    def _publish_forever(self):
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            try:
+                self.flush()
+            except OSError:
+                app.logger.exception('Could not publish request metrics')
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR."""
+        directory = app.config['METRICS_DIR']
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        """Snapshots of every live process publishing to METRICS_DIR, or of this one."""
+        directory = app.config['METRICS_DIR']
+        if not directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for name in os.listdir(directory):
+            match = re.fullmatch(r'metrics-(\d+)\.json', name)
+            if not match:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                os.kill(int(match.group(1)), 0)
+            except ProcessLookupError:
+                os.remove(path)  # exited worker; its counters reset like a restart
+                continue
+            except PermissionError:
+                pass
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+request_metrics = RequestMetrics()
+
+
+def prometheus_labels(names, values):
+    return ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                    for name, value in zip(names, values))
+
+
+def render_prometheus(snapshots):
+    """Merge process snapshots into the Prometheus text exposition format."""
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0.0) + value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(labels))
+            merged = histograms.setdefault(key, [0] * len(values))
+            histograms[key] = [a + b for a, b in zip(merged, values)]
+
+    default_labels = ('endpoint', 'method', 'status')
+    buckets = {'http_request_duration_seconds': LATENCY_BUCKETS, 'db_queries_per_request': QUERY_COUNT_BUCKETS}
+    lines = []
+    for metric, (kind, text) in METRIC_HELP.items():
+        lines += [f'# HELP {metric} {text}', f'# TYPE {metric} {kind}']
+        label_names = METRIC_LABELS.get(metric, default_labels)
+        if kind == 'counter':
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric:
+                    lines.append(f'{metric}{{{prometheus_labels(label_names, labels)}}} {value:g}')
+            continue
+        for (name, labels), values in sorted(histograms.items()):
+            if name != metric:
+                continue
+            label_text = prometheus_labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip(list(buckets[metric]) + ['+Inf'], values[:-2]):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{{label_text}}} {values[-2]:g}')
+            lines.append(f'{metric}_count{{{label_text}}} {values[-1]}')
+    lines += ['# HELP process_startup_seconds Cold-start timings of this process.',
+              '# TYPE process_startup_seconds gauge']
+    for phase, value in startup_timings.items():
+        if value is not None and phase != 'workerStarted':
+            lines.append(f'process_startup_seconds{{phase="{phase}"}} {value:g}')
+    return '\n'.join(lines) + '\n'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query_time(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats = g.get('request_stats') if has_request_context() else None
+    if stats is not None:
+        stats['queries'] += 1
+        stats['sql'] += elapsed
+        if len(stats['statements']) < SLOW_LOG_MAX_STATEMENTS:
+            stats['statements'].append((elapsed, statement))
+
+
+@contextlib.contextmanager
+def timed_serialization():
+    """Count the enclosed time as serialization, excluding SQL run inside it."""
+    stats = g.get('request_stats') if has_request_context() else None
+    started = time.perf_counter()
+    sql_before = stats['sql'] if stats else 0.0
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats['serialize'] += time.perf_counter() - started - (stats['sql'] - sql_before)
+
+
+@app.before_request
+def start_request_stats():
+    g.request_stats = {'started': time.perf_counter(), 'queries': 0, 'sql': 0.0,
+                       'serialize': 0.0, 'statements': []}
+
+
+@app.after_request
+def record_request_stats(response):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - stats['started']
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    labels = (endpoint, request.method, response.status_code)
+    request_metrics.observe('http_request_duration_seconds', labels, elapsed, LATENCY_BUCKETS)
+    request_metrics.observe('db_queries_per_request', labels, stats['queries'], QUERY_COUNT_BUCKETS)
+    request_metrics.inc('db_query_duration_seconds_total', labels, stats['sql'])
+    request_metrics.inc('serialization_duration_seconds_total', labels, stats['serialize'])
+    if not response.is_streamed:
+        request_metrics.inc('http_response_bytes_total', labels, response.content_length or 0)
+
+    if app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = (
+            f'db;dur={stats["sql"] * 1000:.1f};desc="{stats["queries"]} queries", '
+            f'serialize;dur={stats["serialize"] * 1000:.1f}, total;dur={elapsed * 1000:.1f}'
+        )
+    if elapsed * 1000 >= app.config['SLOW_REQUEST_MS']:
+        request_metrics.inc('http_slow_requests_total', labels)
+        app.logger.warning(
+            'Slow request %s %s -> %s: %.1fms, %d queries in %.1fms, serialization %.1fms\n%s',
+            request.method, request.full_path.rstrip('?'), response.status_code, elapsed * 1000,
+            stats['queries'], stats['sql'] * 1000, stats['serialize'] * 1000,
+            '\n'.join(f'  {duration * 1000:8.2f}ms  {" ".join(statement.split())[:300]}'
+                      for duration, statement in stats['statements'])
+        )
+    request_metrics.start_publisher()
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(render_prometheus(request_metrics.collect()), mimetype='text/plain; version=0.0.4')
+
 
 # Health check endpoint
 @app.route('/health')
 def health():
     return "OK", 200
 
-# Serve static files
+# Static assets
+#
+# asset_url() links files in static/ by content hash (styles.<hash>.css);
+# hashed URLs are cached for a year as immutable, so a changed file simply
+# gets a new URL. `flask build-assets` (also run by gunicorn's on_starting
+# hook) writes .gz and, with the brotli package installed, .br variants next
+# to each file, served according to Accept-Encoding. Dynamic responses are
+# gzipped on the way out by compress_response.
+STATIC_DIR = os.path.join(basedir, 'static')
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE_TYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/css',
+                      'application/javascript', 'text/javascript', 'text/plain', 'image/svg+xml'}
+HASHED_ASSET = re.compile(r'(?P<name>.+)\.(?P<hash>[0-9a-f]{12})(?P<ext>\.[^./]+)')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+AVATAR_COLORS = [(79, 70, 229), (16, 185, 129), (245, 158, 11), (239, 68, 68), (59, 130, 246)]
+
+_asset_hashes = {}
+
+
+def asset_hash(filename):
+    """Content hash of a static file (recomputed when the file changes), or None."""
+    path = safe_join(STATIC_DIR, filename)
+    try:
+        stat = os.stat(path) if path else None
+    except OSError:
+        return None
+    if stat is None:
+        return None
+    cached = _asset_hashes.get(filename)
+    if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+        with open(path, 'rb') as f:
+            cached = ((stat.st_mtime_ns, stat.st_size), hashlib.sha256(f.read()).hexdigest()[:12])
+        _asset_hashes[filename] = cached
+    return cached[1]
+
+
+@app.template_global()
+def asset_url(filename):
+    """Content-hashed URL for a file in static/."""
+    digest = asset_hash(filename)
+    if digest is None:
+        return '/static/' + filename
+    name, ext = os.path.splitext(filename)
+    return f'/static/{name}.{digest}{ext}'
+
+
+def build_assets():
+    """Write .gz (and .br) variants of compressible static files; returns the files written."""
+    written = []
+    for filename in sorted(os.listdir(STATIC_DIR)):
+        path = os.path.join(STATIC_DIR, filename)
+        if filename.endswith(('.gz', '.br')) or not os.path.isfile(path):
+            continue
+        if mimetypes.guess_type(filename)[0] not in COMPRESSIBLE_TYPES:
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        variants = [('.gz', lambda: gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', lambda: brotli.compress(data, quality=11)))
+        for suffix, compress in variants:
+            target = path + suffix
+            if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                continue
+            with open(target + '.tmp', 'wb') as f:
+                f.write(compress())
+            os.replace(target + '.tmp', target)
+            written.append(filename + suffix)
+    return written
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Precompress static files for serve_static."""
+    written = build_assets()
+    click.echo(f"Wrote {len(written)} compressed variants" + (': ' + ', '.join(written) if written else ''))
+    if brotli is None:
+        click.echo('brotli is not installed; only gzip variants were built', err=True)
+
+
 @app.route('/static/<path:filename>')
 def serve_static(filename):
-    return send_from_directory('static', filename)
+    match = HASHED_ASSET.fullmatch(filename)
+    immutable = False
+    if match and asset_hash(match['name'] + match['ext']) is not None:
+        filename = match['name'] + match['ext']
+        # An outdated hash still gets the current file, just not as immutable
+        immutable = asset_hash(filename) == match['hash']
+    path = safe_join(STATIC_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        return jsonify({'error': 'Not found'}), 404
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = None
+    for encoding, suffix in PRECOMPRESSED:
+        variant = path + suffix
+        if (request.accept_encodings.quality(encoding) > 0 and os.path.isfile(variant)
+                and os.path.getmtime(variant) >= os.path.getmtime(path)):
+            response = send_file(variant, mimetype=mimetype, conditional=True)
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_file(path, mimetype=mimetype, conditional=True)
+    if mimetype in COMPRESSIBLE_TYPES:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE if immutable else 'no-cache'
+    return response
 
-# Placeholder images for avatars - direct serving for compatibility
-@app.route('/static/avatar1.png')
-def serve_avatar1():
-    return "placeholder", 200, {'Content-Type': 'image/png'}
 
-@app.route('/static/avatar2.png')
-def serve_avatar2():
-    return "placeholder", 200, {'Content-Type': 'image/png'}
+def placeholder_png(rgb, size=64):
+    """A valid size x size PNG filled with one colour."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    rows = (b'\x00' + bytes(rgb) * size) * size
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows, 9)) + chunk(b'IEND', b''))
 
-@app.route('/static/avatar3.png')
-def serve_avatar3():
-    return "placeholder", 200, {'Content-Type': 'image/png'}
 
-@app.route('/static/avatar4.png')
-def serve_avatar4():
-    return "placeholder", 200, {'Content-Type': 'image/png'}
+# Avatars referenced by the sample users: served from static/ when present,
+# otherwise as a generated solid-colour PNG
+@app.route('/static/avatar<int:number>.png')
+def serve_avatar(number):
+    filename = f'avatar{number}.png'
+    if os.path.isfile(os.path.join(STATIC_DIR, filename)):
+        return serve_static(filename)
+    body = placeholder_png(AVATAR_COLORS[(number - 1) % len(AVATAR_COLORS)])
+    response = Response(body, mimetype='image/png')
+    response.set_etag(hashlib.sha1(body).hexdigest())
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response.make_conditional(request)
 
-@app.route('/static/avatar5.png')
-def serve_avatar5():
-    return "placeholder", 200, {'Content-Type': 'image/png'}
 
 # Serve the index page
 @app.route('/')
 def serve_frontend():
-    return render_template('index.html')
+    body = render_template('index.html')
+    etag = make_etag('index', body)
+    response = not_modified(etag)
+    if response is not None:
+        return response
+    return add_validators(Response(body, mimetype='text/html'), etag)
+
+
+def gzip_stream(chunks, level):
+    """Compress a streamed response body incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+@app.after_request
+def compress_response(response):
+    """gzip compressible responses for clients that accept it (not event streams)."""
+    if (response.status_code != 200 or request.method == 'HEAD' or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings.quality('gzip') <= 0:
+        return response
+    level = app.config['COMPRESS_LEVEL']
+    if response.is_streamed:
+        response.response = gzip_stream(response.response, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_BYTES']:
+            return response
+        response.set_data(gzip.compress(data, level))
+    response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# Schema upgrades
+def ensure_columns():
+    """Add model columns missing from existing tables (nullable columns only).
+
+    Like ensure_indexes, this lets new optional columns reach existing
+    databases without a migration tool.
+    """
+    added = []
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable and column.server_default is None:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as conn:
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+                added.append(f'{table.name}.{column.name}')
+    return added
+
+
+# Database indexes
+def ensure_indexes():
+    """Create any model-declared index missing from an existing database.
+
+    db.create_all() only creates indexes together with new tables, so indexes
+    added to a model later are applied here without needing migrations.
+    """
+    created = []
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not table.indexes or not inspector.has_table(table.name):
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                created.append(index.name)
+    if created and db.engine.dialect.name == 'sqlite':
+        # Refresh planner statistics so the new indexes are used
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('ANALYZE')
+    return created
+
+
+# Filter parameters whose combinations are checked by check-query-plans
+PLAN_CHECK_FILTERS = {
+    'state': 'Running',
+    'significance': 'High',
+    'analysisType': 'A/B Test',
+    'stage': 'Discovery',
+    'department': 'Marketing',
+    'boundary': 'efficacy',
+}
+
+
+def explain_experiment_queries():
+    """Run EXPLAIN QUERY PLAN for every supported listing filter combination.
+
+    Returns a list of (filters, plan lines, full_scan) tuples where full_scan
+    is True if the experiments table or the cold store is scanned without an
+    index.
+    """
+    results = []
+    names = sorted(PLAN_CHECK_FILTERS)
+    combinations = [()]
+    for size in range(1, len(names) + 1):
+        combinations.extend(itertools.combinations(names, size))
+    combinations.append(('owner',))
+    cases = [{name: PLAN_CHECK_FILTERS.get(name, '1') for name in combination} for combination in combinations]
+    # Archived states read both stores
+    cases += [dict(args, state=app.config['ARCHIVE_STATES'][0]) for args in cases if 'state' in args]
+    for args in cases:
+        model = experiment_source(args)
+        query = apply_experiment_filters(db.session.query(model), args, model=model)
+        query = query.order_by(model.created_at.desc(), model.id.desc()).limit(DEFAULT_PAGE_SIZE + 1)
+        sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+        plan = [row[-1] for row in db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql))]
+        full_scan = any(
+            re.match(r'SCAN (TABLE )?experiments(_archive)?\b', line) and 'INDEX' not in line
+            for line in plan
+        )
+        results.append((args, plan, full_scan))
+    return results
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any experiment listing filter combination needs a full table scan."""
+    if db.engine.dialect.name != 'sqlite':
+        print('Query plan check is only supported on SQLite')
+        return
+    ensure_indexes()
+    failures = 0
+    for args, plan, full_scan in explain_experiment_queries():
+        label = ', '.join(f'{k}={v}' for k, v in args.items()) or '(no filters)'
+        print(('FULL SCAN  ' if full_scan else 'ok         ') + label)
+        for line in plan:
+            print('           ' + line)
+        failures += full_scan
+    if failures:
+        raise SystemExit(f'{failures} filter combination(s) degrade to a full table scan')
+
 
 # Initialize database with sample data
 def init_db():
     with app.app_context():
         # Create tables
         db.create_all()
+        ensure_columns()
+        ensure_indexes()
         
         # Check if users already exist
         if User.query.count() == 0:
@@ -653,11 +4044,44 @@ def init_db():
             db.session.add_all(experiment_objects)
             db.session.commit()
 
-# Initialize the database when the app starts
-init_db()
+        init_search()
+        init_boundary_index()
+        init_versioning()
+        init_change_log()
+        init_metric_history()
+        init_archive()
+        fail_orphaned_jobs()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create tables, indexes, search index and triggers, and seed sample data."""
+    init_db()
+    print('Database initialized')
+
+
+# Cold-start timings in seconds: module import, and import (or, under
+# gunicorn's preload, worker fork) to first request. Workers no longer touch
+# the schema at import; run `flask init-db` (or let the gunicorn on_starting
+# hook in gunicorn.conf.py run it once) instead.
+startup_timings = {'import': time.perf_counter() - MODULE_IMPORT_STARTED, 'firstRequest': None,
+                   'workerStarted': None, 'firstRequestAfterFork': None}
+
+
+@app.before_first_request
+def record_startup_time():
+    now = time.perf_counter()
+    startup_timings['firstRequest'] = now - MODULE_IMPORT_STARTED
+    if startup_timings['workerStarted'] is not None:
+        startup_timings['firstRequestAfterFork'] = now - startup_timings['workerStarted']
+    app.logger.info('Worker %s: import took %.3fs, first request %.3fs after import (%s after fork)',
+                    os.getpid(), startup_timings['import'], startup_timings['firstRequest'],
+                    '%.3fs' % startup_timings['firstRequestAfterFork']
+                    if startup_timings['firstRequestAfterFork'] is not None else 'n/a')
+
 
 if __name__ == '__main__':
     # For local development
+    init_db()
     port = int(os.environ.get('PORT', 8080))
     print(f"Starting Commercial AI Experimentation Platform...")
     print(f"Access the application at http://localhost:{port}")
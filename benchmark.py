@@ -0,0 +1,437 @@
+"""Benchmark and load-test harness for the experiments API.
+
+Generates synthetic portfolios shaped like the init_db() sample data, then
+drives list/filter/search/detail/create/update/delete requests through the
+Flask test client (in-process) and a local gunicorn (over HTTP), reporting
+p50/p95/p99 latency, throughput and peak RSS as JSON.
+
+    python benchmark.py --sizes 1000,100000 --output results.json
+    python benchmark.py --sizes 1000 --compare results.json
+
+Generated databases are cached in --workdir (one per size and seed) and
+copied before every run, so runs start from identical data. Each run happens
+in a fresh process so DATABASE_URL and peak RSS are per run.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = ['list', 'filter', 'search', 'detail', 'create', 'update', 'delete']
+
+# Value shapes of the init_db() sample portfolio, with rough weights
+STATES = [('Running', 60), ('Completed', 20), ('Stopped', 10), ('Archived', 10)]
+EXPERIMENT_TYPES = [('Fixed Horizon', 60), ('Group Sequential', 40)]
+DEPARTMENTS = [('Marketing', 3), ('Sales', 3), ('Procurement', 3), ('Operations', 3), ('IT', 2),
+               ('Finance', 1), ('HR', 1)]
+STAGES = [('Discovery', 2), ('Pre-launch', 2), ('Pilot', 2), ('Phase 1', 2), ('Phase 2', 2),
+          ('Phase 3', 1), ('Scale', 3)]
+SIGNIFICANCE = [('High', 6), ('Medium', 6), ('Low', 2)]
+ANALYSIS_TYPES = [('Vendor Comparison', 6), ('A/B Test', 4), ('Multivariate', 2), ('Feature Flag', 1),
+                  ('Custom', 1)]
+# Owners per experiment: the sample data has one or two, occasionally three
+OWNER_FAN_OUT = [(1, 55), (2, 35), (3, 10)]
+NAME_SUBJECTS = ['Campaign', 'Lead Scoring', 'Email Subject', 'Demand Forecast', 'Supplier Risk',
+                 'Inventory', 'Churn', 'Pricing', 'Ticket Routing', 'Invoice Matching', 'Chatbot',
+                 'Contract Review', 'Fraud Detection', 'Recommendation', 'Workforce Planning']
+NAME_METHODS = ['ML', 'Algorithm Update', 'Optimization', 'Automation', 'Assistant', 'Model',
+                'Integration', 'Personalization', 'Targeting', 'Prediction']
+FIRST_NAMES = ['John', 'Maya', 'Robert', 'Sarah', 'David', 'Aisha', 'Luis', 'Mei', 'Olga', 'Kwame']
+LAST_NAMES = ['Doe', 'Patel', 'Chen', 'Kim', 'Wilson', 'Garcia', 'Novak', 'Okafor', 'Silva', 'Berg']
+SEARCH_TERMS = ['campaign', 'lead', 'forecast', 'supplier', 'churn', 'pricing', 'fraud', 'chat', 'model', 'maya']
+
+GENERATE_CHUNK = 5000
+
+
+def weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'p50_ms': round(percentile(values, 0.50) * 1000, 3) if values else None,
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3) if values else None,
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3) if values else None,
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else None,
+        'throughput_rps': round(len(values) / elapsed, 1) if elapsed else None,
+    }
+
+
+# Synthetic data
+def generate(path, size, seed):
+    """Create a database at path with size synthetic experiments (runs in a child process)."""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    sys.path.insert(0, HERE)
+    from app import app, db, init_db, experiment_users, Experiment, User
+
+    init_db()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    with app.app_context():
+        user_count = max(5, size // 200)
+        existing_users = User.query.count()
+        users = [{
+            'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'email': f'user{i}@example.com',
+            'department': weighted(rng, DEPARTMENTS),
+            'profile_picture': f'/static/avatar{i % 5 + 1}.png',
+        } for i in range(existing_users, user_count)]
+        if users:
+            db.session.execute(User.__table__.insert(), users)
+        user_ids = [row[0] for row in db.session.query(User.id)]
+
+        now = datetime.datetime.utcnow().replace(microsecond=0)
+        table = Experiment.__table__
+        remaining = size - Experiment.query.count()
+        while remaining > 0:
+            count = min(GENERATE_CHUNK, remaining)
+            first_id = (db.session.query(db.func.max(table.c.id)).scalar() or 0) + 1
+            rows, links = [], []
+            for offset in range(count):
+                target = rng.randint(20, 60)
+                participants = rng.randint(0, int(target * 1.2))
+                impact = round(rng.gauss(4, 6), 1)
+                spread = round(abs(rng.gauss(3, 1)) + 0.5, 1)
+                created = now - datetime.timedelta(seconds=rng.randint(0, 2 * 365 * 86400))
+                rows.append({
+                    'id': first_id + offset,
+                    'name': f'{rng.choice(NAME_SUBJECTS)} {rng.choice(NAME_METHODS)} {first_id + offset}',
+                    'state': weighted(rng, STATES),
+                    'experiment_type': weighted(rng, EXPERIMENT_TYPES),
+                    'stage': weighted(rng, STAGES),
+                    'department': weighted(rng, DEPARTMENTS),
+                    'impact_value': impact,
+                    'impact_positive_bound': round(impact + spread, 1),
+                    'impact_negative_bound': round(impact - spread, 1),
+                    'confidence': round(rng.uniform(50, 99.9), 1),
+                    'progress': min(100, round(participants / target * 100)),
+                    'participants_count': participants,
+                    'participants_target': target,
+                    'sample_size_reached': participants >= target,
+                    'duration_weeks': rng.randint(2, 12),
+                    'duration_days': rng.randint(0, 6),
+                    'significance': weighted(rng, SIGNIFICANCE),
+                    'analysis_type': weighted(rng, ANALYSIS_TYPES),
+                    'boundaries_crossed': 'efficacy' if rng.random() < 0.1 else '',
+                    'created_at': created,
+                    'updated_at': created,
+                })
+                for user_id in rng.sample(user_ids, min(weighted(rng, OWNER_FAN_OUT), len(user_ids))):
+                    links.append({'experiment_id': first_id + offset, 'user_id': user_id})
+            db.session.execute(table.insert(), rows)
+            db.session.execute(experiment_users.insert(), links)
+            db.session.commit()
+            remaining -= count
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+    print(json.dumps({'seconds': round(time.perf_counter() - started, 1)}))
+
+
+def ensure_database(workdir, size, seed):
+    """Path of the pristine generated database for size, generating it if needed."""
+    path = os.path.join(workdir, f'portfolio-{size}-{seed}.db')
+    if not os.path.exists(path):
+        print(f'Generating {size:,} experiments ...', file=sys.stderr)
+        partial = path + '.partial'
+        for leftover in (partial, partial + '-wal', partial + '-shm'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        output = subprocess.run([sys.executable, __file__, '_generate', partial, str(size), str(seed)],
+                                check=True, capture_output=True, text=True).stdout
+        checkpoint(partial)
+        os.replace(partial, path)
+        print(f'  done in {json.loads(output.splitlines()[-1])["seconds"]}s', file=sys.stderr)
+    return path
+
+
+def checkpoint(path):
+    """Fold the WAL into the main file so the database can be copied as one file."""
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    connection.close()
+
+
+def fresh_copy(pristine, workdir):
+    path = os.path.join(workdir, 'run.db')
+    for leftover in (path, path + '-wal', path + '-shm'):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    shutil.copyfile(pristine, path)
+    return path
+
+
+# Request plans
+def request_plan(scenario, rng, max_id, count):
+    """List of (method, path, JSON body) for one scenario."""
+    plan = []
+    for i in range(count):
+        if scenario == 'list':
+            plan.append(('GET', '/api/experiments?limit=50', None))
+        elif scenario == 'filter':
+            department = weighted(rng, DEPARTMENTS).replace(' ', '+')
+            plan.append(('GET', f'/api/experiments?state=Running&department={department}&limit=50', None))
+        elif scenario == 'search':
+            plan.append(('GET', f'/api/experiments?search={rng.choice(SEARCH_TERMS)}&limit=50', None))
+        elif scenario == 'detail':
+            plan.append(('GET', f'/api/experiments/{rng.randint(1, max_id)}', None))
+        elif scenario == 'create':
+            plan.append(('POST', '/api/experiments', {
+                'name': f'{rng.choice(NAME_SUBJECTS)} benchmark {i}',
+                'experimentType': weighted(rng, EXPERIMENT_TYPES),
+                'department': weighted(rng, DEPARTMENTS),
+                'impact': {'value': 3.0, 'positiveBound': 5.0, 'negativeBound': 1.0},
+                'owners': [1, 2],
+            }))
+        elif scenario == 'update':
+            plan.append(('PUT', f'/api/experiments/{rng.randint(1, max_id)}',
+                         {'confidence': round(rng.uniform(50, 99.9), 1), 'progress': rng.randint(0, 100)}))
+        elif scenario == 'delete':
+            # Delete the rows added by the create scenario, newest first
+            plan.append(('DELETE', f'/api/experiments/{max_id + count - i}', None))
+    return plan
+
+
+def peak_rss_mb(pids=None):
+    """Peak RSS in MiB: of this process, or summed over pids (Linux /proc)."""
+    if pids is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+        except (OSError, StopIteration):
+            return None
+    return round(total / 1024, 1)
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        children.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return children
+
+
+def run_client(path, size, seed, requests):
+    """Drive the Flask test client in this process (runs in a child process)."""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    sys.path.insert(0, HERE)
+    import app as application
+    application.app.logger.setLevel('ERROR')
+    client = application.app.test_client()
+    rng = random.Random(seed)
+    results = []
+    for scenario in SCENARIOS:
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for method, url, body in request_plan(scenario, rng, size, requests):
+            request_started = time.perf_counter()
+            response = client.open(url, method=method, json=body)
+            response.get_data()
+            latencies.append(time.perf_counter() - request_started)
+            errors += response.status_code >= 400
+        results.append(dict(scenario=scenario, **summarize(latencies, errors, time.perf_counter() - started)))
+    print(json.dumps({'results': results, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def run_gunicorn(path, size, seed, requests, concurrency, workers):
+    """Drive a local gunicorn over HTTP with concurrency client threads."""
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + path, PORT=str(port),
+               WEB_CONCURRENCY=str(workers), LOG_LEVEL='ERROR', SLOW_REQUEST_MS='1e9')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'], cwd=HERE, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', '/health')
+                if connection.getresponse().status == 200:
+                    break
+            except OSError:
+                pass
+            if time.time() > deadline or server.poll() is not None:
+                raise RuntimeError('gunicorn did not start')
+            time.sleep(0.2)
+
+        rng = random.Random(seed)
+        results = []
+        for scenario in SCENARIOS:
+            plan = request_plan(scenario, rng, size, requests)
+            if scenario == 'delete':
+                # Deletes of ids created concurrently may race; keep them ordered per thread
+                plan.sort(key=lambda item: item[1])
+            shards = [plan[i::concurrency] for i in range(concurrency)]
+
+            def drive(shard):
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                latencies, errors = [], 0
+                for method, url, body in shard:
+                    data = json.dumps(body) if body is not None else None
+                    headers = {'Content-Type': 'application/json'} if body is not None else {}
+                    request_started = time.perf_counter()
+                    connection.request(method, url, body=data, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    latencies.append(time.perf_counter() - request_started)
+                    errors += response.status >= 400
+                connection.close()
+                return latencies, errors
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                outcomes = list(pool.map(drive, shards))
+            elapsed = time.perf_counter() - started
+            latencies = [value for shard_latencies, _ in outcomes for value in shard_latencies]
+            errors = sum(shard_errors for _, shard_errors in outcomes)
+            results.append(dict(scenario=scenario, **summarize(latencies, errors, elapsed)))
+        rss = peak_rss_mb([server.pid] + child_pids(server.pid))
+        return results, rss
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+# Reporting
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print p95 and throughput changes against a baseline; return the regressions."""
+    with open(baseline_path) as f:
+        baseline = {(r['size'], r['mode'], r['scenario']): r for r in json.load(f)['results']}
+    regressions = []
+    print(f"{'size':>8} {'mode':>9} {'scenario':>8} {'p95 ms':>18} {'throughput rps':>22}")
+    for result in results:
+        before = baseline.get((result['size'], result['mode'], result['scenario']))
+        if before is None or not before['p95_ms'] or not before['throughput_rps']:
+            continue
+        p95_change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+        rps_change = (result['throughput_rps'] - before['throughput_rps']) / before['throughput_rps'] * 100
+        flag = ''
+        if p95_change > threshold or rps_change < -threshold or result['errors'] > before['errors']:
+            regressions.append(result)
+            flag = '  REGRESSION'
+        print(f"{result['size']:>8} {result['mode']:>9} {result['scenario']:>8} "
+              f"{before['p95_ms']:>7.2f} -> {result['p95_ms']:>7.2f} "
+              f"{before['throughput_rps']:>8.1f} -> {result['throughput_rps']:>8.1f} "
+              f"({p95_change:+.0f}% / {rps_change:+.0f}%){flag}")
+    return regressions
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '_generate':
+        return generate(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    if len(sys.argv) > 1 and sys.argv[1] == '_client':
+        return run_client(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5]))
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='1000', help='Comma-separated portfolio sizes, e.g. 1000,100000,1000000.')
+    parser.add_argument('--modes', default='client,gunicorn', help='client and/or gunicorn.')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads against gunicorn.')
+    parser.add_argument('--workers', type=int, default=2, help='Gunicorn worker processes.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'commercial-ai-benchmark'),
+                        help='Where generated databases are cached.')
+    parser.add_argument('--output', help='Write the JSON report to this file (default stdout).')
+    parser.add_argument('--compare', help='Baseline JSON report to compare against.')
+    parser.add_argument('--threshold', type=float, default=20.0,
+                        help='Percent change in p95 or throughput counted as a regression.')
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    # The listing cache would turn repeated list requests into cache hits
+    os.environ.setdefault('EXPERIMENTS_CACHE_BACKEND', 'none')
+    results = []
+    for size in (int(value) for value in args.sizes.split(',')):
+        pristine = ensure_database(args.workdir, size, args.seed)
+        for mode in modes:
+            print(f'Running {mode} against {size:,} experiments ...', file=sys.stderr)
+            path = fresh_copy(pristine, args.workdir)
+            if mode == 'client':
+                output = subprocess.run(
+                    [sys.executable, __file__, '_client', path, str(size), str(args.seed), str(args.requests)],
+                    check=True, capture_output=True, text=True).stdout
+                report = json.loads(output.splitlines()[-1])
+                mode_results, rss = report['results'], report['peak_rss_mb']
+            elif mode == 'gunicorn':
+                mode_results, rss = run_gunicorn(path, size, args.seed, args.requests,
+                                                 args.concurrency, args.workers)
+            else:
+                parser.error(f'unknown mode {mode}')
+            for result in mode_results:
+                results.append(dict(size=size, mode=mode, peak_rss_mb=rss, **result))
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z',
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'workers': args.workers,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
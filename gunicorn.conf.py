@@ -0,0 +1,35 @@
+# Gunicorn configuration, loaded automatically from the working directory.
+import os
+import shutil
+import tempfile
+import time
+
+bind = '0.0.0.0:' + os.environ.get('PORT', '8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# Import the app once in the master; workers fork with it already loaded
+preload_app = True
+# Workers publish request metrics here so /metrics covers all of them
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='commercial-ai-metrics-'))
+
+
+def on_starting(server):
+    """Initialize the database and static assets once in the master, before workers fork."""
+    from app import app, build_assets, db, init_db, read_engine
+    init_db()
+    build_assets()
+    # Don't let forked workers inherit the master's pooled connections
+    with app.app_context():
+        engine = read_engine()
+        if engine is not None:
+            engine.dispose()
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    from app import startup_timings
+    startup_timings['workerStarted'] = time.perf_counter()
+
+
+def on_exit(server):
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
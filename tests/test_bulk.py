@@ -0,0 +1,31 @@
+import pytest
+
+
+def boundaries_of(client, created):
+    return [client.get(f"/api/experiments/{item['id']}").json['boundariesCrossed'] for item in created]
+
+
+@pytest.mark.parametrize('boundaries', [
+    [None, ['efficacy']],
+    [['harm'], None],
+])
+def test_bulk_create_with_mixed_boundary_fields(client, boundaries):
+    body = [{'name': f'Mixed {i}'} if b is None else {'name': f'Mixed {i}', 'boundariesCrossed': b}
+            for i, b in enumerate(boundaries)]
+    response = client.post('/api/experiments/bulk', json=body)
+    assert response.status_code == 200
+    assert response.json['errors'] == []
+    assert boundaries_of(client, response.json['created']) == [b or [] for b in boundaries]
+
+
+def test_bulk_update_applies_items_in_request_order(client):
+    created = client.post('/api/experiments/bulk', json=[{'name': 'Ordered'}]).json['created']
+    experiment_id = created[0]['id']
+    response = client.patch('/api/experiments/bulk', json=[
+        {'id': experiment_id, 'state': 'Stopped', 'stage': 'Pilot'},
+        {'id': experiment_id, 'state': 'Running'},
+    ])
+    assert response.status_code == 200
+    assert response.json['updated'] == [experiment_id]
+    experiment = client.get(f'/api/experiments/{experiment_id}').json
+    assert (experiment['state'], experiment['stage']) == ('Running', 'Pilot')
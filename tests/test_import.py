@@ -0,0 +1,20 @@
+import json
+
+
+def test_import_with_mixed_boundary_fields(client):
+    records = [
+        {'name': 'Import plain'},
+        {'name': 'Import crossed', 'boundariesCrossed': ['efficacy']},
+        {'name': 'Import plain again'},
+        {'name': 'Import bad', 'boundariesCrossed': 'efficacy'},
+    ]
+    body = '\n'.join(json.dumps(record) for record in records)
+    response = client.post('/api/experiments/import?chunkSize=10', data=body,
+                           content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.json['imported'] == 3
+    assert [error['line'] for error in response.json['errors']] == [4]
+
+    listing = client.get('/api/experiments?search=Import&sort=recent&fields=name,boundariesCrossed').json
+    crossed = {experiment['name']: experiment['boundariesCrossed'] for experiment in listing['experiments']}
+    assert crossed == {'Import plain': [], 'Import crossed': ['efficacy'], 'Import plain again': []}
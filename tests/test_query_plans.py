@@ -0,0 +1,9 @@
+from app import app, explain_experiment_queries
+
+
+def test_listing_filters_use_indexes(client):
+    with app.app_context():
+        results = explain_experiment_queries()
+    assert results
+    full_scans = [args for args, plan, full_scan in results if full_scan]
+    assert full_scans == []